@@ -2,11 +2,32 @@
 Image Upload Service for Questions
 Handles uploading images to Supabase Storage for questions and options
 """
+import mimetypes
 import os
 import uuid
 from typing import Dict, Any, Optional, List
 from datetime import datetime
-import mimetypes
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Shared pool for concurrent storage uploads; bounded so a large batch
+# cannot exhaust connections to Supabase Storage
+MAX_UPLOAD_WORKERS = 8
+_upload_executor = ThreadPoolExecutor(max_workers=MAX_UPLOAD_WORKERS,
+                                      thread_name_prefix="image-upload")
+
+# Content types for the common image extensions; avoids mimetypes lookups for
+# most uploads, anything else still goes through mimetypes
+_MIME_BY_EXT = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.svg': 'image/svg+xml',
+}
+
+# Max paths per storage remove() request, keeps request bodies small
+DELETE_BATCH_SIZE = 100
 
 class ImageUploadService:
     def __init__(self, supabase_client):
@@ -19,6 +40,13 @@ class ImageUploadService:
         self.supabase = supabase_client
         self.bucket_name = "question-images"  # Supabase storage bucket name
 
+        # supabase.storage() builds a new storage client (and HTTP connection
+        # pool) on every call; bind the bucket once so uploads reuse keep-alive connections
+        self._bucket = supabase_client.storage().from_(self.bucket_name)
+
+        # Public URLs are a pure string format, so build them locally
+        self._public_url_prefix = f"{supabase_client.storage_url}/object/public/{self.bucket_name}/"
+
     def create_bucket_if_not_exists(self):
         """
         Check if the storage bucket exists by attempting to list files.
@@ -26,7 +54,7 @@ class ImageUploadService:
         """
         try:
             # Try to list files in the bucket - if it works, bucket exists
-            self.supabase.storage().from_(self.bucket_name).list()
+            self._bucket.list()
             return {
                 "success": True,
                 "message": f"Bucket '{self.bucket_name}' exists and is accessible"
@@ -67,17 +95,18 @@ class ImageUploadService:
             unique_filename = f"questions/{question_id}/question{file_ext}"
 
             # Detect content type
-            content_type = mimetypes.guess_type(file_name)[0] or 'image/png'
+            content_type = (_MIME_BY_EXT.get(file_ext.lower())
+                            or mimetypes.guess_type(file_name)[0]
+                            or 'image/png')
 
             # Upload to Supabase Storage
-            result = self.supabase.storage().from_(self.bucket_name).upload(
+            result = self._bucket.upload(
                 unique_filename,
                 image_file,
                 file_options={"content-type": content_type}
             )
 
-            # Get public URL
-            public_url = self.supabase.storage().from_(self.bucket_name).get_public_url(unique_filename)
+            public_url = self._public_url_prefix + unique_filename
 
             return {
                 "success": True,
@@ -115,17 +144,18 @@ class ImageUploadService:
             unique_filename = f"questions/{question_id}/options/option_{option_key}{file_ext}"
 
             # Detect content type
-            content_type = mimetypes.guess_type(file_name)[0] or 'image/png'
+            content_type = (_MIME_BY_EXT.get(file_ext.lower())
+                            or mimetypes.guess_type(file_name)[0]
+                            or 'image/png')
 
             # Upload to Supabase Storage
-            result = self.supabase.storage().from_(self.bucket_name).upload(
+            result = self._bucket.upload(
                 unique_filename,
                 image_file,
                 file_options={"content-type": content_type}
             )
 
-            # Get public URL
-            public_url = self.supabase.storage().from_(self.bucket_name).get_public_url(unique_filename)
+            public_url = self._public_url_prefix + unique_filename
 
             return {
                 "success": True,
@@ -141,11 +171,32 @@ class ImageUploadService:
                 "message": f"Failed to upload option image: {str(e)}"
             }
 
+    def submit_option_image_upload(self,
+                                   question_id: str,
+                                   option_key: str,
+                                   image_file,
+                                   file_name: str) -> Future:
+        """
+        Start an option image upload on the shared upload pool.
+        Lets callers overlap the upload with their own database queries.
+
+        Returns:
+            Future resolving to the upload_option_image result dict
+        """
+        return _upload_executor.submit(
+            self.upload_option_image,
+            question_id=question_id,
+            option_key=option_key,
+            image_file=image_file,
+            file_name=file_name
+        )
+
     def upload_multiple_option_images(self,
                                      question_id: str,
                                      option_images: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Upload multiple option images at once.
+        Uploads run concurrently on a shared thread pool; results keep input order.
 
         Args:
             question_id: ID of the question
@@ -154,15 +205,16 @@ class ImageUploadService:
         Returns:
             Dict with upload results
         """
-        results = []
-        for option_img in option_images:
-            result = self.upload_option_image(
+        futures = [
+            self.submit_option_image_upload(
                 question_id=question_id,
                 option_key=option_img['option_key'],
                 image_file=option_img['file'],
                 file_name=option_img['file_name']
             )
-            results.append(result)
+            for option_img in option_images
+        ]
+        results = [future.result() for future in futures]
 
         success_count = sum(1 for r in results if r['success'])
 
@@ -181,20 +233,44 @@ class ImageUploadService:
         Args:
             image_path: Path to the image in storage
 
+        Returns:
+            Dict with deletion status
+        """
+        result = self.delete_question_images([image_path])
+        if not result["success"]:
+            return {
+                "success": False,
+                "error": result["error"],
+                "message": f"Failed to delete image: {result['error']}"
+            }
+        return {
+            "success": True,
+            "message": "Image deleted successfully"
+        }
+
+    def delete_question_images(self, image_paths: List[str]) -> Dict[str, Any]:
+        """
+        Delete several images from storage with batched remove() calls.
+
+        Args:
+            image_paths: Paths to the images in storage
+
         Returns:
             Dict with deletion status
         """
         try:
-            self.supabase.storage().from_(self.bucket_name).remove([image_path])
+            for start in range(0, len(image_paths), DELETE_BATCH_SIZE):
+                self._bucket.remove(image_paths[start:start + DELETE_BATCH_SIZE])
             return {
                 "success": True,
-                "message": "Image deleted successfully"
+                "deleted_count": len(image_paths),
+                "message": f"Deleted {len(image_paths)} images"
             }
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e),
-                "message": f"Failed to delete image: {str(e)}"
+                "message": f"Failed to delete images: {str(e)}"
             }
 
     def delete_all_question_images(self, question_id: str) -> Dict[str, Any]:
@@ -208,19 +284,14 @@ class ImageUploadService:
             Dict with deletion status
         """
         try:
-            # List all files in the question folder
-            files = self.supabase.storage().from_(self.bucket_name).list(f"questions/{question_id}")
+            # List every object under the question folder, including the nested
+            # options/ images, in one query (see docs/supabase_migration_performance.sql)
+            result = self.supabase.rpc("question_image_paths", {"qid": question_id}).execute()
+            file_paths = [row["name"] for row in result.data or []]
 
-            if files:
+            if file_paths:
                 # Delete all files
-                file_paths = [f"questions/{question_id}/{f['name']}" for f in files]
-                self.supabase.storage().from_(self.bucket_name).remove(file_paths)
-
-                return {
-                    "success": True,
-                    "deleted_count": len(file_paths),
-                    "message": f"Deleted {len(file_paths)} images"
-                }
+                return self.delete_question_images(file_paths)
             else:
                 return {
                     "success": True,
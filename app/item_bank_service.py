@@ -3,11 +3,13 @@ Item Bank Retrieval Service for Computer Adaptive Mastery Testing
 Facilitates searching and retrieving questions from Supabase
 """
 import os
+import threading
 from typing import Dict, List, Any, Optional, Union
 from dotenv import load_dotenv
 import asyncio
 import pandas as pd
 import numpy as np
+from cachetools import TTLCache
 from pydantic import BaseModel, Field
 
 
@@ -15,6 +17,40 @@ from pydantic import BaseModel, Field
 # Load environment variables
 load_dotenv()
 
+# Read-through cache settings for search results
+SEARCH_CACHE_MAXSIZE = 1024
+SEARCH_CACHE_TTL = 60  # seconds
+
+# Attribute rows change rarely, so they are cached per ID for longer
+ATTRIBUTE_CACHE_MAXSIZE = 4096
+ATTRIBUTE_CACHE_TTL = 300  # seconds
+
+# Assembled item banks (questions, attributes, Q-matrix array) per filter; they
+# only change when questions or attributes do, which clears the cache
+ITEM_BANK_CACHE_MAXSIZE = 64
+ITEM_BANK_CACHE_TTL = 300  # seconds
+
+# Question columns the item bank consumers (stats, EduCDM export) actually read
+ITEM_BANK_QUESTION_COLUMNS = (
+    "id, exam_id, subject_id, chapter_id, topic_id, concept_id, "
+    "difficulty, discrimination, guessing"
+)
+
+# QuestionFilter field -> (questions column, PostgREST operator) used by
+# _apply_filters; text search runs websearch syntax against content, matching
+# the expression GIN index on to_tsvector('english', content) (see
+# docs/supabase_migration_performance.sql)
+_FILTER_MAP = (
+    ("exam_id", "exam_id", "eq"),
+    ("subject_id", "subject_id", "eq"),
+    ("chapter_id", "chapter_id", "eq"),
+    ("topic_id", "topic_id", "eq"),
+    ("concept_id", "concept_id", "eq"),
+    ("difficulty_min", "difficulty", "gte"),
+    ("difficulty_max", "difficulty", "lte"),
+    ("text_search", "content", "wfts(english)"),
+)
+
 # Define Pydantic models for data validation
 class QuestionFilter(BaseModel):
     """Filter parameters for question retrieval."""
@@ -67,6 +103,58 @@ class ItemBankService:
             from supabase import create_client, Client
             self.supabase = create_client(supabase_url, supabase_key)
 
+        # Short-lived cache for read-heavy searches; cleared on writes
+        self._search_cache = TTLCache(maxsize=SEARCH_CACHE_MAXSIZE, ttl=SEARCH_CACHE_TTL)
+        self._attribute_cache = TTLCache(maxsize=ATTRIBUTE_CACHE_MAXSIZE, ttl=ATTRIBUTE_CACHE_TTL)
+        self._item_bank_cache = TTLCache(maxsize=ITEM_BANK_CACHE_MAXSIZE, ttl=ITEM_BANK_CACHE_TTL)
+        self._cache_lock = threading.Lock()
+        # Bumped on every invalidation; results fetched under an older
+        # generation are not stored, so a slow fill cannot outlive a write
+        self._cache_generation = 0
+
+    def invalidate_cache(self):
+        """Drop all cached search results (call after writes to questions or hierarchy)."""
+        with self._cache_lock:
+            self._cache_generation += 1
+            self._search_cache.clear()
+            self._attribute_cache.clear()
+            self._item_bank_cache.clear()
+
+    def _cache_attributes(self, attributes: List[Dict[str, Any]], generation: int):
+        with self._cache_lock:
+            if generation != self._cache_generation:
+                return
+            for attribute in attributes:
+                self._attribute_cache[attribute["id"]] = dict(attribute)
+
+    def _get_attributes(self, attribute_ids: List[str]) -> List[Dict[str, Any]]:
+        """Fetch attribute rows by ID, querying Supabase only for IDs not cached."""
+        with self._cache_lock:
+            found = {aid: self._attribute_cache.get(aid) for aid in attribute_ids}
+            generation = self._cache_generation
+
+        missing = [aid for aid, attribute in found.items() if attribute is None]
+        if missing:
+            attrs_result = self.supabase.table("attributes") \
+                .select("id, name, description, topic_id") \
+                .in_("id", missing) \
+                .execute()
+            self._cache_attributes(attrs_result.data, generation)
+            found.update((attribute["id"], attribute) for attribute in attrs_result.data)
+
+        return [dict(found[aid]) for aid in attribute_ids if found.get(aid) is not None]
+
+    def _cache_get(self, key):
+        """Return (cached value or None, current cache generation)."""
+        with self._cache_lock:
+            return self._search_cache.get(key), self._cache_generation
+
+    def _cache_set(self, key, value, generation: int):
+        """Store `value` unless the cache was invalidated since `generation`."""
+        with self._cache_lock:
+            if generation == self._cache_generation:
+                self._search_cache[key] = value
+
     async def search_questions(self, filters: QuestionFilter, page: int = 1,
                     page_size: int = 20) -> Dict[str, Any]:
             """
@@ -80,45 +168,33 @@ class ItemBankService:
             Returns:
                 Dictionary with results and pagination info
             """
-            # Start building the query for counting
-            count_query = self.supabase.table("questions").select("*", count="exact")
-
-            # Start building the query for data
-            data_query = self.supabase.table("questions").select("*")
-
-            # Apply filters to both queries
-            for query in [count_query, data_query]:
-                if filters.exam_id:
-                    query = query.eq("exam_id", filters.exam_id)
-                if filters.subject_id:
-                    query = query.eq("subject_id", filters.subject_id)
-                if filters.chapter_id:
-                    query = query.eq("chapter_id", filters.chapter_id)
-                if filters.topic_id:
-                    query = query.eq("topic_id", filters.topic_id)
-                if filters.concept_id:
-                    query = query.eq("concept_id", filters.concept_id)
-
-                # Apply difficulty range if provided
-                if filters.difficulty_min is not None:
-                    query = query.gte("difficulty", filters.difficulty_min)
-                if filters.difficulty_max is not None:
-                    query = query.lte("difficulty", filters.difficulty_max)
-
-                # Apply text search if provided - CHANGED THIS PART
-                if filters.text_search:
-                    query = query.ilike("content", f"%{filters.text_search}%")
-
-            # Execute count query
-            count_result = count_query.execute()
-            total_count = count_result.count
-
-            # Apply pagination to data query
-            data_query = data_query.range((page - 1) * page_size, page * page_size - 1)
-
-            # Execute data query
-            result = data_query.execute()
+            cache_key = ("questions", tuple(sorted(filters.dict(exclude_none=True).items())), page, page_size)
+            cached, generation = self._cache_get(cache_key)
+            if cached is None:
+                cached = self._search_questions_uncached(filters, page, page_size)
+                self._cache_set(cache_key, cached, generation)
+
+            # Callers enrich the question dicts in place, so hand out copies
+            return {
+                "data": [dict(question) for question in cached["data"]],
+                "pagination": dict(cached["pagination"])
+            }
+
+    def _search_questions_uncached(self, filters: QuestionFilter, page: int,
+                                   page_size: int) -> Dict[str, Any]:
+            """Run the paginated question search against Supabase."""
+            # Build a single query that returns both the page and the exact
+            # total count, instead of issuing a separate count query
+            query = self.supabase.table("questions").select("*", count="exact")
+            query = self._apply_filters(query, filters)
+
+            # Apply pagination
+            query = query.range((page - 1) * page_size, page * page_size - 1)
+
+            # Execute query
+            result = query.execute()
             questions = result.data
+            total_count = result.count or 0
 
             # Calculate pagination details
             total_pages = (total_count + page_size - 1) // page_size
@@ -134,6 +210,25 @@ class ItemBankService:
                 }
             }
 
+    def _apply_filters(self, query, filters: QuestionFilter):
+        """
+        Apply question filters to a Supabase query.
+
+        Args:
+            query: Supabase query builder on the questions table
+            filters: Search filters
+
+        Returns:
+            Query with filters applied
+        """
+        for field, column, operator in _FILTER_MAP:
+            value = getattr(filters, field)
+            if value is None or value == "":
+                continue
+            query = query.filter(column, operator, value)
+
+        return query
+
     async def get_question_with_attributes(self, question_id: str) -> Optional[QuestionResponse]:
         """
         Get a question by ID with its associated attributes.
@@ -152,58 +247,70 @@ class ItemBankService:
 
         question = result.data[0]
 
-        # Get q-matrix entries for this question
+        # Get the q-matrix entries set to true for this question
         q_matrix_result = self.supabase.table("q_matrix") \
-            .select("attribute_id, value") \
+            .select("attribute_id") \
             .eq("question_id", question_id) \
+            .eq("value", True) \
             .execute()
 
         q_matrix_entries = q_matrix_result.data
 
-        # Get attribute details for the attributes in the q-matrix
-        attribute_ids = [entry["attribute_id"] for entry in q_matrix_entries if entry["value"]]
+        # Get attribute details for the attributes in the q-matrix (deduplicated)
+        attribute_ids = list({entry["attribute_id"] for entry in q_matrix_entries})
 
-        attributes = []
-        if attribute_ids:
-            attrs_result = self.supabase.table("attributes") \
-                .select("id, name, description, topic_id") \
-                .in_("id", attribute_ids) \
-                .execute()
+        attributes = self._get_attributes(attribute_ids) if attribute_ids else []
 
-            attributes = attrs_result.data
-
-        # Combine question with attributes
-        question_response = QuestionResponse(
+        # Combine question with attributes; rows come straight from the questions
+        # table, so skip Pydantic validation
+        question_response = QuestionResponse.construct(
             **question,
             attributes=attributes
         )
 
         return question_response
 
-    async def get_item_bank(self, filters: QuestionFilter) -> Dict[str, Any]:
+    async def get_item_bank(self, filters: QuestionFilter, packed: bool = False,
+                            question_columns: str = ITEM_BANK_QUESTION_COLUMNS) -> Dict[str, Any]:
         """
         Get a complete item bank based on filters, including q-matrix.
 
         Args:
             filters: Search filters
+            packed: Return the Q-matrix bit-packed along the attribute axis
+            question_columns: Columns to select from questions (must include id)
 
         Returns:
-            Dictionary with questions, attributes, and q-matrix
+            Dictionary with questions, attributes, q-matrix, and id -> row/column
+            index maps (question_index, attribute_index) for reuse by consumers.
+            The contents are cached and shared between callers, so treat them
+            as read-only (the Q-matrix array is not writeable).
         """
-        # Get questions
-        query = self.supabase.table("questions").select("*")
+        cache_key = (tuple(sorted(filters.dict(exclude_none=True).items())), packed, question_columns)
+        with self._cache_lock:
+            cached = self._item_bank_cache.get(cache_key)
+            generation = self._cache_generation
+        if cached is None:
+            cached = self._get_item_bank_uncached(filters, packed, question_columns)
+            cached["q_matrix_array"].flags.writeable = False
+            self._cache_attributes(cached["attributes"], generation)
+            with self._cache_lock:
+                if generation == self._cache_generation:
+                    self._item_bank_cache[cache_key] = cached
+
+        return dict(cached)
+
+    def _get_item_bank_uncached(self, filters: QuestionFilter, packed: bool,
+                                question_columns: str) -> Dict[str, Any]:
+        """Build the item bank from Supabase and pivot its Q-matrix."""
+        # Get questions with their q-matrix entries and attribute details
+        # embedded, so the whole item bank comes back in a single round-trip
+        query = self.supabase.table("questions").select(
+            f"{question_columns}, q_matrix(attribute_id, value, attributes(id, name, description, topic_id))"
+        )
 
         # Apply filters
-        if filters.exam_id:
-            query = query.eq("exam_id", filters.exam_id)
-        if filters.subject_id:
-            query = query.eq("subject_id", filters.subject_id)
-        if filters.chapter_id:
-            query = query.eq("chapter_id", filters.chapter_id)
-        if filters.topic_id:
-            query = query.eq("topic_id", filters.topic_id)
-        if filters.concept_id:
-            query = query.eq("concept_id", filters.concept_id)
+        query = self._apply_filters(query, filters)
 
         # Execute query
         result = query.execute()
@@ -214,47 +321,53 @@ class ItemBankService:
                 "questions": [],
                 "attributes": [],
                 "q_matrix": [],
-                "q_matrix_array": np.array([])
+                "q_matrix_array": np.array([], dtype=np.uint8),
+                "question_index": {},
+                "attribute_index": {}
             }
 
-        # Get question IDs
-        question_ids = [q["id"] for q in questions]
-
-        # Get q-matrix entries for these questions
-        q_matrix_result = self.supabase.table("q_matrix") \
-            .select("question_id, attribute_id, value") \
-            .in_("question_id", question_ids) \
-            .execute()
-
-        q_matrix_entries = q_matrix_result.data
-
-        # Get attribute IDs from q-matrix
-        attribute_ids = list(set([entry["attribute_id"] for entry in q_matrix_entries]))
-
-        # Get attribute details
-        attributes = []
-        if attribute_ids:
-            attrs_result = self.supabase.table("attributes") \
-                .select("id, name, description, topic_id") \
-                .in_("id", attribute_ids) \
-                .execute()
-
-            attributes = attrs_result.data
+        # Unpack the embedded q-matrix entries and attributes
+        q_matrix_entries = []
+        attributes_by_id = {}
+        for question in questions:
+            for entry in question.pop("q_matrix", None) or []:
+                attribute = entry.get("attributes")
+                q_matrix_entries.append({
+                    "question_id": question["id"],
+                    "attribute_id": entry["attribute_id"],
+                    "value": entry["value"]
+                })
+                if attribute and attribute["id"] not in attributes_by_id:
+                    attributes_by_id[attribute["id"]] = attribute
+
+        attributes = list(attributes_by_id.values())
+
+        # Map IDs to indices once; consumers of the item bank reuse them
+        question_index = {q["id"]: i for i, q in enumerate(questions)}
+        attribute_index = {attribute_id: j for j, attribute_id in enumerate(attributes_by_id)}
 
         # Convert to EduCDM compatible format
-        q_matrix_array = self._convert_to_q_matrix_array(questions, attributes, q_matrix_entries)
+        q_matrix_array = self._convert_to_q_matrix_array(
+            questions, attributes, q_matrix_entries, packed=packed,
+            question_index=question_index, attribute_index=attribute_index
+        )
 
         return {
             "questions": questions,
             "attributes": attributes,
             "q_matrix": q_matrix_entries,
-            "q_matrix_array": q_matrix_array
+            "q_matrix_array": q_matrix_array,
+            "question_index": question_index,
+            "attribute_index": attribute_index
         }
 
     def _convert_to_q_matrix_array(self,
                                  questions: List[Dict[str, Any]],
                                  attributes: List[Dict[str, Any]],
-                                 q_matrix_entries: List[Dict[str, Any]]) -> np.ndarray:
+                                 q_matrix_entries: List[Dict[str, Any]],
+                                 packed: bool = False,
+                                 question_index: Optional[Dict[str, int]] = None,
+                                 attribute_index: Optional[Dict[str, int]] = None) -> np.ndarray:
         """
         Convert Q-matrix entries to a numpy array for EduCDM.
 
@@ -262,24 +375,37 @@ class ItemBankService:
             questions: List of questions
             attributes: List of attributes
             q_matrix_entries: List of Q-matrix entries
+            packed: Bit-pack each row with np.packbits (8 attributes per byte)
+            question_index: Precomputed question ID -> row map (built if omitted)
+            attribute_index: Precomputed attribute ID -> column map (built if omitted)
 
         Returns:
-            NumPy array representing the Q-matrix
+            NumPy uint8 array representing the Q-matrix
         """
-        # Create empty Q-matrix
-        q_matrix = np.zeros((len(questions), len(attributes)))
+        # Create empty Q-matrix; entries are strictly 0/1 so uint8 is enough
+        q_matrix = np.zeros((len(questions), len(attributes)), dtype=np.uint8)
+
+        if not q_matrix_entries:
+            return np.packbits(q_matrix, axis=1) if packed else q_matrix
 
         # Map IDs to indices
-        question_index = {q["id"]: i for i, q in enumerate(questions)}
-        attribute_index = {a["id"]: j for j, a in enumerate(attributes)}
+        if question_index is None:
+            question_index = {q["id"]: i for i, q in enumerate(questions)}
+        if attribute_index is None:
+            attribute_index = {a["id"]: j for j, a in enumerate(attributes)}
+
+        # Resolve all entries to (row, column) positions in one vectorized pass
+        entries = pd.DataFrame(q_matrix_entries, columns=["question_id", "attribute_id", "value"])
+        q_idx = entries["question_id"].map(question_index).to_numpy(dtype=float)
+        a_idx = entries["attribute_id"].map(attribute_index).to_numpy(dtype=float)
+        values = entries["value"].fillna(False).astype(bool).to_numpy()
 
-        # Fill Q-matrix
-        for entry in q_matrix_entries:
-            q_idx = question_index.get(entry["question_id"])
-            a_idx = attribute_index.get(entry["attribute_id"])
+        # Fill Q-matrix, skipping entries whose question or attribute is unknown
+        known = ~(np.isnan(q_idx) | np.isnan(a_idx))
+        q_matrix[q_idx[known].astype(int), a_idx[known].astype(int)] = values[known]
 
-            if q_idx is not None and a_idx is not None:
-                q_matrix[q_idx, a_idx] = 1 if entry["value"] else 0
+        if packed:
+            return np.packbits(q_matrix, axis=1)
 
         return q_matrix
 
@@ -296,7 +422,7 @@ class ItemBankService:
             item_bank: Item bank dictionary with questions and attributes
 
         Returns:
-            NumPy array of user responses (1=correct, 0=incorrect, NaN=not answered)
+            float32 NumPy array of user responses (1=correct, 0=incorrect, NaN=not answered)
         """
         # Get user responses from the database
         # This assumes you have a "responses" table in your database
@@ -311,17 +437,22 @@ class ItemBankService:
 
         # Create response pattern
         questions = item_bank["questions"]
-        response_pattern = np.full(len(questions), np.nan)
+        response_pattern = np.full(len(questions), np.nan, dtype=np.float32)
 
-        # Map question IDs to indices
-        question_index = {q["id"]: i for i, q in enumerate(questions)}
+        if not responses:
+            return response_pattern
 
-        # Fill response pattern
-        for response in responses:
-            q_idx = question_index.get(response["question_id"])
+        # Map question IDs to indices, reusing the map built by get_item_bank
+        question_index = item_bank.get("question_index")
+        if question_index is None:
+            question_index = {q["id"]: i for i, q in enumerate(questions)}
 
-            if q_idx is not None:
-                response_pattern[q_idx] = 1 if response["is_correct"] else 0
+        # Fill response pattern, skipping responses to questions outside the bank
+        responses_df = pd.DataFrame(responses, columns=["question_id", "is_correct"])
+        q_idx = responses_df["question_id"].map(question_index).to_numpy(dtype=float)
+        known = ~np.isnan(q_idx)
+        response_pattern[q_idx[known].astype(int)] = \
+            responses_df["is_correct"].fillna(False).astype(bool).to_numpy()[known]
 
         return response_pattern
 
@@ -335,8 +466,8 @@ class ItemBankService:
         Returns:
             Dictionary with data formatted for EduCDM
         """
-        # Get item bank
-        item_bank = await self.get_item_bank(filters)
+        # Get item bank; the export only needs question IDs
+        item_bank = await self.get_item_bank(filters, question_columns="id")
 
         questions = item_bank["questions"]
         attributes = item_bank["attributes"]
@@ -368,6 +499,16 @@ class ItemBankService:
             if level not in valid_levels:
                 raise ValueError(f"Invalid level. Must be one of: {valid_levels}")
 
+            cache_key = ("hierarchy", level, query)
+            cached, generation = self._cache_get(cache_key)
+            if cached is None:
+                cached = self._search_hierarchical_structure_uncached(query, level)
+                self._cache_set(cache_key, cached, generation)
+
+            return [dict(item) for item in cached]
+
+    def _search_hierarchical_structure_uncached(self, query: str, level: str) -> List[Dict[str, Any]]:
+            """Run the hierarchy name search against Supabase."""
             # Build query
             search_query = self.supabase.table(level).select("*")
 
@@ -3,24 +3,282 @@ LLM Attribute Generation Service using OpenRouter models for extracting
 attributes and 3PL parameters from questions
 """
 import os
-import json
+import copy
+import hashlib
+import re
+import threading
+import time
+import orjson
 import requests
-from typing import Dict, List, Any, Optional, Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Any, Optional, Tuple, Union
+from cachetools import TTLCache
+from pydantic import BaseModel, Field, validator
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Shared pool for running independent OpenRouter calls side by side
+MAX_LLM_WORKERS = 8
+_llm_executor = ThreadPoolExecutor(max_workers=MAX_LLM_WORKERS,
+                                   thread_name_prefix="llm-call")
+
+# Default number of questions processed at once by the *_many batch helpers
+DEFAULT_BATCH_CONCURRENCY = 20
+
+# Completions are cached by (model, max_tokens, prompt) so re-runs over the
+# same questions skip the OpenRouter round trip
+LLM_CACHE_MAXSIZE = 4096
+LLM_CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+
+# Fallbacks for replies that wrap the JSON payload in prose
+_ARRAY_RE = re.compile(r'\[\s*{.*}\s*\]', re.DOTALL)
+_OBJ_RE = re.compile(r'{.*}', re.DOTALL)
+
+# Extra attempts when a JSON-mode reply still fails to parse; the parse error
+# is sent back to the model so it can correct itself
+LLM_PARSE_RETRIES = 2
+
+# OpenAI-compatible Batch API used for bulk, latency-insensitive extraction
+# (OpenRouter does not offer one); batches complete within the window below.
+# Batch mode needs its own LLM_BATCH_API_KEY; the OpenRouter key is never sent there
+LLM_BATCH_API_URL = os.getenv("LLM_BATCH_API_URL", "https://api.openai.com/v1")
+LLM_BATCH_COMPLETION_WINDOW = "24h"
+LLM_BATCH_MODEL = os.getenv("LLM_BATCH_MODEL", "gpt-4o-mini")
+
+# Client-side OpenRouter limits so concurrent fan-out stays under the account's
+# quota instead of triggering 429 storms; an RPM or TPM of 0 disables that limit
+OPENROUTER_RPM = int(os.getenv("OPENROUTER_RPM", "500"))
+OPENROUTER_TPM = int(os.getenv("OPENROUTER_TPM", "0"))
+
+
+# Prompt templates (%-style); only the per-question fields are filled in per call
+_ATTRIBUTE_PROMPT = """\
+You are an expert cognitive diagnostic model specialist for educational assessment.
+
+Please analyze the following question and extract key knowledge attributes that a student
+needs to master to correctly answer it. Each attribute should represent a specific skill,
+knowledge component, or cognitive process required.
+
+Educational context:
+- Exam: %(exam)s
+- Subject: %(subject)s
+- Chapter: %(chapter)s
+- Topic: %(topic)s
+- Concept: %(concept)s
+
+Question: %(question_text)s
+
+Please identify 3-7 specific cognitive attributes needed to answer this question.
+For each attribute:
+1. Provide a concise name (2-5 words)
+2. Write a brief description explaining what this attribute entails
+
+Return your answer as a JSON object with an 'attributes' key holding an array of
+objects with 'name' and 'description' keys.
+Example format:
+{
+    "attributes": [
+        {"name": "Attribute name", "description": "Detailed description of the attribute"},
+        ...
+    ]
+}
+"""
+
+_3PL_PROMPT = """\
+You are an expert in Item Response Theory and psychometrics.
+
+Please analyze the following multiple-choice question and estimate the three parameters
+for the 3PL (three-parameter logistic) model:
+
+1. Difficulty (b): A value between -3 (very easy) and 3 (very difficult), with 0 being average difficulty.
+2. Discrimination (a): A value between 0.5 and 2.5, where higher values indicate the item better discriminates between students of different ability levels.
+3. Guessing (c): A value between 0.05 and 0.5, representing the probability a student with minimal ability would answer correctly by guessing.
+
+Context:
+- Exam: %(exam)s
+- Subject: %(subject)s
+
+Question: %(question_text)s
+
+Options:
+%(options_text)s
+
+Correct answer: %(correct_answer)s
+
+For each parameter, provide a numerical value and a brief justification for your estimation.
+Return your answer as a JSON object with 'difficulty', 'discrimination', and 'guessing' keys.
+Example format:
+{
+    "difficulty": 1.2,
+    "discrimination": 1.8,
+    "guessing": 0.25,
+    "justification": "Brief explanation of your reasoning"
+}
+"""
+
+_COMBINED_PROMPT = """\
+You are an expert cognitive diagnostic model specialist and psychometrician.
+
+Please analyze the following multiple-choice question and provide:
+
+A. The key knowledge attributes a student needs to master to answer it correctly.
+   Identify 3-7 specific skills, knowledge components, or cognitive processes, each with
+   a concise name (2-5 words) and a brief description of what it entails.
+
+B. The three parameters of the 3PL (three-parameter logistic) model:
+   1. Difficulty (b): A value between -3 (very easy) and 3 (very difficult), with 0 being average difficulty.
+   2. Discrimination (a): A value between 0.5 and 2.5, where higher values indicate the item better discriminates between students of different ability levels.
+   3. Guessing (c): A value between 0.05 and 0.5, representing the probability a student with minimal ability would answer correctly by guessing.
+
+Educational context:
+- Exam: %(exam)s
+- Subject: %(subject)s
+- Chapter: %(chapter)s
+- Topic: %(topic)s
+- Concept: %(concept)s
+
+Question: %(question_text)s
+
+Options:
+%(options_text)s
+
+Correct answer: %(correct_answer)s
+
+Return your answer as a JSON object with 'attributes' and 'parameters' keys.
+Example format:
+{
+    "attributes": [
+        {"name": "Attribute name", "description": "Detailed description of the attribute"},
+        ...
+    ],
+    "parameters": {
+        "difficulty": 1.2,
+        "discrimination": 1.8,
+        "guessing": 0.25,
+        "justification": "Brief explanation of your reasoning"
+    }
+}
+"""
+
+
+# Ranges the 3PL prompts ask for; estimates outside them are clamped, not rejected
+THREE_PL_BOUNDS = {
+    "difficulty": (-3.0, 3.0),
+    "discrimination": (0.5, 2.5),
+    "guessing": (0.05, 0.5),
+}
+
+
+class ThreePLParameters(BaseModel):
+    """3PL item parameters as returned by the LLM, clamped to THREE_PL_BOUNDS."""
+    difficulty: float = Field(0.0, description="Difficulty (b)")
+    discrimination: float = Field(1.0, description="Discrimination (a)")
+    guessing: float = Field(0.25, description="Guessing (c)")
+
+    @validator("difficulty", "discrimination", "guessing")
+    def _clamp(cls, value, field):
+        low, high = THREE_PL_BOUNDS[field.name]
+        return min(max(value, low), high)
+
+
+class _RateLimiter:
+    """
+    Thread-safe token bucket holding `capacity` units, refilled evenly over
+    `period` seconds. A capacity of 0 or less means no limit.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.unlimited = self.capacity <= 0
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0):
+        """Block until `amount` units are available, then take them."""
+        if self.unlimited:
+            return
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def release(self, amount: float):
+        """Return unused units (e.g. when a request used fewer tokens than estimated)."""
+        if self.unlimited:
+            return
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
 class LLMAttributeService:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, batch_api_key=None):
         """Initialize the LLM service with OpenRouter API credentials."""
         self.api_key = api_key 
         self.api_url = "https://openrouter.ai/api/v1/chat/completions"
+        self.batch_api_url = LLM_BATCH_API_URL
+        self.batch_api_key = batch_api_key or os.getenv("LLM_BATCH_API_KEY")
 
         if not self.api_key:
             raise ValueError("OpenRouter API key must be set in environment variables")
+
+        # Persistent session so keep-alive connections (and their TLS handshakes)
+        # are reused across calls; transient failures are retried with backoff
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(["POST"]),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.headers.update(self.get_headers())
+
+        # Batch API calls mix JSON, multipart uploads, and polling GETs
+        batch_retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(["GET", "POST"]),
+            raise_on_status=False
+        )
+        self.batch_session = requests.Session()
+        self.batch_session.mount("https://", HTTPAdapter(max_retries=batch_retry))
+        if self.batch_api_key:
+            self.batch_session.headers.update({"Authorization": f"Bearer {self.batch_api_key}"})
+
+        self._response_cache = TTLCache(maxsize=LLM_CACHE_MAXSIZE, ttl=LLM_CACHE_TTL)
+        self._cache_lock = threading.Lock()
+        # Calls currently in flight, by cache key; duplicates wait on the first
+        self._inflight: Dict[str, Future] = {}
+
+        self._request_limiter = _RateLimiter(OPENROUTER_RPM)
+        self._token_limiter = _RateLimiter(OPENROUTER_TPM) if OPENROUTER_TPM > 0 else None
             
     # [Rest of your class code remains the same...]
+    @property
+    def batch_enabled(self) -> bool:
+        """Whether Batch API calls can be made (LLM_BATCH_API_KEY is set)."""
+        return bool(self.batch_api_key)
+
     def get_headers(self) -> Dict[str, str]:
         """Generate request headers for OpenRouter API."""
         return {
@@ -30,6 +288,101 @@ class LLMAttributeService:
             "X-Title": "Computer Adaptive Mastery Test System"
         }
 
+    def _call_llm(self, model: str, prompt: str, max_tokens: int,
+                  parse: Callable[[str], Any]) -> Any:
+        """
+        Send a JSON-mode chat completion and parse the reply content.
+        Parsed results are cached by a hash of the model, token budget, and prompt;
+        replies that fail to parse are retried and never cached. Identical calls
+        made while one is in flight wait for its result instead of re-requesting.
+
+        Args:
+            model: OpenRouter model to use
+            prompt: User prompt
+            max_tokens: Completion token budget
+            parse: Turns the reply content into the result
+
+        Returns:
+            Parsed result (a copy when served from the cache)
+        """
+        key = hashlib.sha256(f"{model}\0{max_tokens}\0{prompt}".encode("utf-8")).hexdigest()
+        with self._cache_lock:
+            cached = self._response_cache.get(key)
+            pending = self._inflight.get(key) if cached is None else None
+            if cached is None and pending is None:
+                future = self._inflight[key] = Future()
+        if cached is not None:
+            return copy.deepcopy(cached)
+        if pending is not None:
+            return copy.deepcopy(pending.result())
+
+        try:
+            result = self._request_llm(model, prompt, max_tokens, parse)
+        except BaseException as e:
+            with self._cache_lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        # Cache and release the key together so no caller can miss both
+        cached = copy.deepcopy(result)
+        with self._cache_lock:
+            self._response_cache[key] = cached
+            self._inflight.pop(key, None)
+        future.set_result(cached)
+
+        return result
+
+    def _request_llm(self, model: str, prompt: str, max_tokens: int,
+                     parse: Callable[[str], Any]) -> Any:
+        """Request a completion, feeding parse errors back to the model for a retry."""
+        messages = [{"role": "user", "content": prompt}]
+
+        for attempt in range(LLM_PARSE_RETRIES + 1):
+            payload = self._completion_payload(model, messages, max_tokens)
+
+            # Rough token estimate (4 chars per token) reserved up front and
+            # corrected from the reported usage afterwards
+            estimated_tokens = sum(len(message["content"]) for message in messages) // 4 + max_tokens
+            self._request_limiter.acquire()
+            if self._token_limiter:
+                self._token_limiter.acquire(estimated_tokens)
+
+            response = self.session.post(self.api_url, json=payload)
+
+            if response.status_code != 200:
+                raise Exception(f"API request failed with status {response.status_code}: {response.text}")
+
+            body = orjson.loads(response.content)
+            if self._token_limiter:
+                used_tokens = (body.get("usage") or {}).get("total_tokens", estimated_tokens)
+                self._token_limiter.release(estimated_tokens - used_tokens)
+
+            content = body["choices"][0]["message"]["content"]
+            try:
+                result = parse(content)
+                break
+            except ValueError as e:
+                if attempt == LLM_PARSE_RETRIES:
+                    raise
+                messages = messages + [
+                    {"role": "assistant", "content": content},
+                    {"role": "user", "content": f"That reply could not be used: {e}. Respond again with only the corrected JSON object."}
+                ]
+
+        return result
+
+    @staticmethod
+    def _completion_payload(model: str, messages: List[Dict[str, str]], max_tokens: int) -> Dict[str, Any]:
+        """Build a JSON-mode chat completion request body."""
+        return {
+            "model": model,
+            "messages": messages,
+            "temperature": 0.2,
+            "max_tokens": max_tokens,
+            "response_format": {"type": "json_object"}
+        }
+
     def extract_attributes(self,
                          question_text: str,
                          exam: str,
@@ -53,66 +406,45 @@ class LLMAttributeService:
         Returns:
             List of attributes with name and description
         """
-        prompt = f"""
-        You are an expert cognitive diagnostic model specialist for educational assessment.
-
-        Please analyze the following question and extract key knowledge attributes that a student
-        needs to master to correctly answer it. Each attribute should represent a specific skill,
-        knowledge component, or cognitive process required.
-
-        Educational context:
-        - Exam: {exam}
-        - Subject: {subject}
-        - Chapter: {chapter}
-        - Topic: {topic}
-        - Concept: {concept}
-
-        Question: {question_text}
-
-        Please identify 3-7 specific cognitive attributes needed to answer this question.
-        For each attribute:
-        1. Provide a concise name (2-5 words)
-        2. Write a brief description explaining what this attribute entails
-
-        Return your answer as a JSON array of objects with 'name' and 'description' keys.
-        Example format:
-        [
-            {{"name": "Attribute name", "description": "Detailed description of the attribute"}},
-            ...
-        ]
-        """
-
-        payload = {
-            "model": model,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.2,
-            "max_tokens": 1500
+        prompt = _ATTRIBUTE_PROMPT % {
+            "exam": exam,
+            "subject": subject,
+            "chapter": chapter,
+            "topic": topic,
+            "concept": concept,
+            "question_text": question_text
         }
 
-        response = requests.post(
-            self.api_url,
-            headers=self.get_headers(),
-            json=payload
-        )
-
-        if response.status_code != 200:
-            raise Exception(f"API request failed with status {response.status_code}: {response.text}")
-
-        content = response.json()["choices"][0]["message"]["content"]
+        return self._call_llm(model, prompt, 1500, self._parse_attributes)
 
+    @staticmethod
+    def _parse_attributes(content: str) -> List[Dict[str, str]]:
+        """Extract the attribute list from an LLM reply."""
         # Extract JSON from the response
         try:
             # Try to parse the entire content as JSON
-            attributes = json.loads(content)
-        except json.JSONDecodeError:
+            attributes = orjson.loads(content)
+        except orjson.JSONDecodeError:
             # If that fails, look for JSON array in the content
-            import re
-            json_match = re.search(r'\[\s*{.*}\s*\]', content, re.DOTALL)
+            json_match = _ARRAY_RE.search(content)
             if json_match:
-                attributes = json.loads(json_match.group(0))
+                attributes = orjson.loads(json_match.group(0))
             else:
                 raise ValueError("Could not parse attributes from LLM response")
 
+        # JSON mode replies wrap the array in {"attributes": [...]}
+        if isinstance(attributes, dict):
+            attributes = attributes.get("attributes")
+
+        return LLMAttributeService._check_attributes(attributes)
+
+    @staticmethod
+    def _check_attributes(attributes: Any) -> List[Dict[str, str]]:
+        """Ensure a parsed attribute list has the expected shape."""
+        if not isinstance(attributes, list) or not all(
+                isinstance(attribute, dict) and attribute.get("name") for attribute in attributes):
+            raise ValueError("'attributes' must be an array of objects with 'name' and 'description'")
+
         return attributes
 
     def generate_3pl_parameters(self,
@@ -136,76 +468,115 @@ class LLMAttributeService:
         Returns:
             Dictionary with difficulty, discrimination, and guessing parameters
         """
-        options_text = "\n".join([f"{i+1}. {opt}" for i, opt in enumerate(options)])
+        prompt = self._build_3pl_prompt(question_text, options, correct_answer, exam, subject)
 
-        prompt = f"""
-        You are an expert in Item Response Theory and psychometrics.
+        return self._call_llm(model, prompt, 2000, self._parse_3pl_parameters)
 
-        Please analyze the following multiple-choice question and estimate the three parameters
-        for the 3PL (three-parameter logistic) model:
+    @staticmethod
+    def _build_3pl_prompt(question_text: str,
+                          options: List[str],
+                          correct_answer: str,
+                          exam: str,
+                          subject: str) -> str:
+        """Build the 3PL parameter estimation prompt for a question."""
+        options_text = "\n".join([f"{i+1}. {opt}" for i, opt in enumerate(options)])
 
-        1. Difficulty (b): A value between -3 (very easy) and 3 (very difficult), with 0 being average difficulty.
-        2. Discrimination (a): A value between 0.5 and 2.5, where higher values indicate the item better discriminates between students of different ability levels.
-        3. Guessing (c): A value between 0.05 and 0.5, representing the probability a student with minimal ability would answer correctly by guessing.
+        prompt = _3PL_PROMPT % {
+            "exam": exam,
+            "subject": subject,
+            "question_text": question_text,
+            "options_text": options_text,
+            "correct_answer": correct_answer
+        }
 
-        Context:
-        - Exam: {exam}
-        - Subject: {subject}
+        return prompt
 
-        Question: {question_text}
+    @staticmethod
+    def _parse_3pl_parameters(content: str) -> Dict[str, float]:
+        """Extract the 3PL parameters from an LLM reply."""
+        # Extract JSON from the response
+        try:
+            # Try to parse the entire content as JSON
+            parameters = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # If that fails, look for JSON object in the content
+            json_match = _OBJ_RE.search(content)
+            if json_match:
+                parameters = orjson.loads(json_match.group(0))
+            else:
+                raise ValueError("Could not parse 3PL parameters from LLM response")
 
-        Options:
-        {options_text}
+        return LLMAttributeService._select_3pl_parameters(parameters)
 
-        Correct answer: {correct_answer}
+    @staticmethod
+    def _select_3pl_parameters(parameters: Any) -> Dict[str, float]:
+        """
+        Validate the 3PL parameters in a parsed object. Missing keys take their
+        defaults and out-of-range values are clamped to THREE_PL_BOUNDS;
+        non-numeric values raise ValueError (pydantic's ValidationError is one),
+        which sends the error back to the model for a retry.
+        """
+        if not isinstance(parameters, dict):
+            raise ValueError("3PL parameters must be a JSON object")
 
-        For each parameter, provide a numerical value and a brief justification for your estimation.
-        Return your answer as a JSON object with 'difficulty', 'discrimination', and 'guessing' keys.
-        Example format:
-        {{
-            "difficulty": 1.2,
-            "discrimination": 1.8,
-            "guessing": 0.25,
-            "justification": "Brief explanation of your reasoning"
-        }}
+        return ThreePLParameters.parse_obj(parameters).dict()
+
+    def combined_extract(self,
+                         question_text: str,
+                         options: List[str],
+                         correct_answer: str,
+                         exam: str,
+                         subject: str,
+                         chapter: str,
+                         topic: str,
+                         concept: str,
+                         model: str = "deepseek/deepseek-chat-v3-0324:free") -> Dict[str, Any]:
         """
+        Extract attributes and 3PL parameters for a question in a single LLM call.
 
-        payload = {
-            "model": model,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.2,
-            "max_tokens": 2000
-        }
+        Args:
+            question_text: The question text
+            options: List of answer options
+            correct_answer: The correct answer
+            exam, subject, chapter, topic, concept: Educational hierarchy
+            model: OpenRouter model to use
 
-        response = requests.post(
-            self.api_url,
-            headers=self.get_headers(),
-            json=payload
-        )
+        Returns:
+            Dictionary with 'attributes' (list of name/description) and 'parameters' (3PL values)
+        """
+        options_text = "\n".join([f"{i+1}. {opt}" for i, opt in enumerate(options)])
 
-        if response.status_code != 200:
-            raise Exception(f"API request failed with status {response.status_code}: {response.text}")
+        prompt = _COMBINED_PROMPT % {
+            "exam": exam,
+            "subject": subject,
+            "chapter": chapter,
+            "topic": topic,
+            "concept": concept,
+            "question_text": question_text,
+            "options_text": options_text,
+            "correct_answer": correct_answer
+        }
 
-        content = response.json()["choices"][0]["message"]["content"]
+        return self._call_llm(model, prompt, 3000, self._parse_combined)
 
-        # Extract JSON from the response
+    @staticmethod
+    def _parse_combined(content: str) -> Dict[str, Any]:
+        """Extract attributes and 3PL parameters from a combined LLM reply."""
         try:
-            # Try to parse the entire content as JSON
-            parameters = json.loads(content)
-        except json.JSONDecodeError:
-            # If that fails, look for JSON object in the content
-            import re
-            json_match = re.search(r'{.*}', content, re.DOTALL)
+            combined = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            json_match = _OBJ_RE.search(content)
             if json_match:
-                parameters = json.loads(json_match.group(0))
+                combined = orjson.loads(json_match.group(0))
             else:
-                raise ValueError("Could not parse 3PL parameters from LLM response")
+                raise ValueError("Could not parse attributes and 3PL parameters from LLM response")
+
+        if not isinstance(combined, dict):
+            raise ValueError("Reply must be a JSON object with 'attributes' and 'parameters'")
 
-        # Extract only the parameters we need
         return {
-            "difficulty": parameters.get("difficulty", 0.0),
-            "discrimination": parameters.get("discrimination", 1.0),
-            "guessing": parameters.get("guessing", 0.25),
+            "attributes": LLMAttributeService._check_attributes(combined.get("attributes")),
+            "parameters": LLMAttributeService._select_3pl_parameters(combined.get("parameters"))
         }
 
     def process_question_attributes_and_parameters(self,
@@ -217,7 +588,8 @@ class LLMAttributeService:
                                                       chapter: str,
                                                       topic: str,
                                                       concept: str,
-                                                      model: str = "deepseek/deepseek-chat-v3-0324:free") -> Tuple[List[Dict[str, str]], Dict[str, float]]:
+                                                      model: str = "deepseek/deepseek-chat-v3-0324:free",
+                                                      unified: bool = True) -> Tuple[List[Dict[str, str]], Dict[str, float]]:
         """
         Process a question to extract both attributes and 3PL parameters.
 
@@ -227,21 +599,208 @@ class LLMAttributeService:
             correct_answer: The correct answer
             exam, subject, chapter, topic, concept: Educational hierarchy
             model: OpenRouter model to use
+            unified: Ask for both in one LLM call; False issues two separate calls
 
         Returns:
             Tuple of (attributes, parameters)
         """
-        # In a production environment, you might want to run these in parallel
-        # For simplicity, we run them sequentially here
+        if unified:
+            combined = self.combined_extract(
+                question_text, options, correct_answer,
+                exam, subject, chapter, topic, concept, model
+            )
+            return combined["attributes"], combined["parameters"]
+
+        # The two calls are independent: run the 3PL estimate on the shared pool
+        # while extracting attributes on this thread, so latency is max() not sum()
+        parameters_future = _llm_executor.submit(
+            self.generate_3pl_parameters,
+            question_text, options, correct_answer, exam, subject, model
+        )
+
         attributes = self.extract_attributes(
             question_text, exam, subject, chapter, topic, concept, model
         )
 
-        parameters = self.generate_3pl_parameters(
-            question_text, options, correct_answer, exam, subject, model
-        )
+        parameters = parameters_future.result()
 
         return attributes, parameters
 
+    def process_many(self,
+                     items: List[Dict[str, Any]],
+                     max_concurrency: int = DEFAULT_BATCH_CONCURRENCY) -> List[Union[Tuple[List[Dict[str, str]], Dict[str, float]], Exception]]:
+        """
+        Process many questions with bounded concurrency.
+
+        Args:
+            items: Keyword arguments for process_question_attributes_and_parameters, one dict per question
+            max_concurrency: Maximum number of questions in flight at once
+
+        Returns:
+            Results in input order; a failed question yields its exception instead of a tuple
+        """
+        return self._run_many(self.process_question_attributes_and_parameters, items, max_concurrency)
+
+    def generate_3pl_parameters_many(self,
+                                     items: List[Dict[str, Any]],
+                                     max_concurrency: int = DEFAULT_BATCH_CONCURRENCY) -> List[Union[Dict[str, float], Exception]]:
+        """
+        Generate 3PL parameters for many questions with bounded concurrency.
+
+        Args:
+            items: Keyword arguments for generate_3pl_parameters, one dict per question
+            max_concurrency: Maximum number of requests in flight at once
+
+        Returns:
+            Results in input order; a failed question yields its exception instead of a dict
+        """
+        return self._run_many(self.generate_3pl_parameters, items, max_concurrency)
+
+    def submit_batch(self, batch_requests: List[Dict[str, Any]]) -> str:
+        """
+        Submit chat completions to the Batch API instead of calling them one by one.
+        Batches trade latency (up to 24h) for lower per-token cost and no per-minute limits.
+
+        Args:
+            batch_requests: Dicts with 'custom_id', 'model', 'prompt', and 'max_tokens'
+
+        Returns:
+            Batch ID for poll_batch / collect_batch
+        """
+        if not self.batch_enabled:
+            raise ValueError("LLM_BATCH_API_KEY must be set to use the Batch API")
+
+        lines = [
+            orjson.dumps({
+                "custom_id": item["custom_id"],
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._completion_payload(
+                    item["model"], [{"role": "user", "content": item["prompt"]}], item["max_tokens"]
+                )
+            })
+            for item in batch_requests
+        ]
+
+        upload = self.batch_session.post(
+            f"{self.batch_api_url}/files",
+            data={"purpose": "batch"},
+            files={"file": ("batch.jsonl", b"\n".join(lines), "application/jsonl")}
+        )
+        if upload.status_code != 200:
+            raise Exception(f"Batch file upload failed with status {upload.status_code}: {upload.text}")
+
+        response = self.batch_session.post(
+            f"{self.batch_api_url}/batches",
+            json={
+                "input_file_id": orjson.loads(upload.content)["id"],
+                "endpoint": "/v1/chat/completions",
+                "completion_window": LLM_BATCH_COMPLETION_WINDOW
+            }
+        )
+        if response.status_code != 200:
+            raise Exception(f"Batch creation failed with status {response.status_code}: {response.text}")
+
+        return orjson.loads(response.content)["id"]
+
+    def poll_batch(self, batch_id: str) -> Dict[str, Any]:
+        """
+        Get the current state of a submitted batch.
+
+        Returns:
+            Batch object; 'status' is one of validating, in_progress, finalizing,
+            completed, failed, expired, cancelling, cancelled
+        """
+        response = self.batch_session.get(f"{self.batch_api_url}/batches/{batch_id}")
+        if response.status_code != 200:
+            raise Exception(f"Batch lookup failed with status {response.status_code}: {response.text}")
+
+        return orjson.loads(response.content)
+
+    def collect_batch(self, batch_id: str, parse: Callable[[str], Any]) -> Dict[str, Any]:
+        """
+        Download and parse the results of a completed batch.
+
+        Args:
+            batch_id: ID returned by submit_batch
+            parse: Turns each reply content into a result
+
+        Returns:
+            Mapping of custom_id to the parsed result, or to the exception for a failed request
+        """
+        batch = self.poll_batch(batch_id)
+        if batch["status"] != "completed":
+            raise ValueError(f"Batch {batch_id} is {batch['status']}, not completed")
+
+        results: Dict[str, Any] = {}
+        for file_id in (batch.get("output_file_id"), batch.get("error_file_id")):
+            if not file_id:
+                continue
+
+            response = self.batch_session.get(f"{self.batch_api_url}/files/{file_id}/content")
+            if response.status_code != 200:
+                raise Exception(f"Batch result download failed with status {response.status_code}: {response.text}")
+
+            for line in response.content.splitlines():
+                if not line.strip():
+                    continue
+                record = orjson.loads(line)
+                reply = record.get("response") or {}
+                if record.get("error") or reply.get("status_code") != 200:
+                    results[record["custom_id"]] = Exception(
+                        f"Batch request failed: {record.get('error') or reply.get('body')}"
+                    )
+                    continue
+                try:
+                    results[record["custom_id"]] = parse(reply["body"]["choices"][0]["message"]["content"])
+                except ValueError as e:
+                    results[record["custom_id"]] = e
+
+        return results
+
+    def submit_3pl_batch(self,
+                         items: List[Dict[str, Any]],
+                         model: str = LLM_BATCH_MODEL) -> str:
+        """
+        Submit 3PL parameter estimation for many questions as one batch.
+
+        Args:
+            items: Keyword arguments for generate_3pl_parameters plus a 'custom_id', one dict per question
+            model: Batch API model to use
+
+        Returns:
+            Batch ID; collect with collect_3pl_batch
+        """
+        return self.submit_batch([
+            {
+                "custom_id": item["custom_id"],
+                "model": item.get("model", model),
+                "prompt": self._build_3pl_prompt(
+                    item["question_text"], item["options"], item["correct_answer"],
+                    item["exam"], item["subject"]
+                ),
+                "max_tokens": 2000
+            }
+            for item in items
+        ])
+
+    def collect_3pl_batch(self, batch_id: str) -> Dict[str, Any]:
+        """Collect a completed 3PL batch as custom_id -> parameters (or exception)."""
+        return self.collect_batch(batch_id, self._parse_3pl_parameters)
+
+    @staticmethod
+    def _run_many(func: Callable[..., Any],
+                  items: List[Dict[str, Any]],
+                  max_concurrency: int) -> List[Any]:
+        """Call func(**item) for each item on a bounded pool, keeping input order."""
+        if not items:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(items)),
+                                thread_name_prefix="llm-batch") as pool:
+            futures = [pool.submit(func, **item) for item in items]
+
+        return [future.exception() or future.result() for future in futures]
+
 # Usage example
 
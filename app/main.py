@@ -2,16 +2,27 @@
 Flask API for Computer Adaptive Mastery Testing System
 Enhanced with PYQ (Previous Year Questions) Upload and Retrieval Services
 """
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, g, has_request_context, stream_with_context
 from flask_cors import CORS
 import json
+import base64
+import hashlib
+import orjson
+import numpy as np
+import msgspec
 import traceback
+import functools
+import logging
 from typing import Dict, List, Any, Optional, Union
 import os
 import asyncio
+import threading
 import uuid
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from cachetools import TTLCache
 from io import BytesIO
-from zipfile import ZipFile
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED
 from xml.sax.saxutils import escape
 
 # Import the existing services
@@ -21,7 +32,7 @@ from .llm_attribute_service import *
 
 # Import the new PYQ services
 from .pyq_upload_service import PYQUploadService, PYQQuestion, PYQMetadata
-from .pyq_retriever_service import PYQRetrieverService, PYQSessionFilter, SessionStatus
+from .pyq_retriever_service import PYQRetrieverService, PYQSessionFilter, SessionStatus, SubmitAnswerRequest
 
 # Import image upload service
 from .image_upload_service import ImageUploadService
@@ -30,6 +41,8 @@ from .image_upload_service import ImageUploadService
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+logger = logging.getLogger(__name__)
+
 # Environment variables
 supabase_url = os.environ.get('SUPABASE_URL')
 supabase_key = os.environ.get('SUPABASE_KEY')
@@ -86,49 +99,547 @@ def get_concepts(topic_id=None):
     result = query.execute()
     return result.data
 
+def cached_select(table, columns, filters):
+    """
+    Select `columns` from `table` where each filter column equals its value (or
+    is one of them, for a list/tuple). Identical selects are memoized on flask.g
+    for the rest of the request, so only use this for reads.
+    """
+    key = _select_key(table, columns, filters)
+    memo = _query_memo()
+    if key not in memo:
+        memo[key] = _run_select(table, columns, filters)
+    return memo[key]
+
+def _query_memo():
+    return g.setdefault("query_cache", {}) if has_request_context() else {}
+
+def _select_key(table, columns, filters):
+    return (table, columns, tuple(sorted(
+        (column, tuple(value) if isinstance(value, (list, tuple)) else value)
+        for column, value in filters.items()
+    )))
+
+def _run_select(table, columns, filters):
+    query = kb.client.table(table).select(columns)
+    for column, value in filters.items():
+        query = query.in_(column, list(value)) if isinstance(value, (list, tuple)) else query.eq(column, value)
+    return query.execute().data or []
+
+def _get_row_by_id(table, item_id):
+    """Get a row by ID (memoized for the rest of the request)."""
+    rows = cached_select(table, "*", {"id": item_id})
+    return rows[0] if rows else None
+
 def get_exam_by_id(exam_id):
     """Get exam by ID."""
-    result = kb.client.table("exams").select("*").eq("id", exam_id).execute()
-    return result.data[0] if result.data else None
+    return _get_row_by_id("exams", exam_id)
 
 def get_subject_by_id(subject_id):
     """Get subject by ID."""
-    result = kb.client.table("subjects").select("*").eq("id", subject_id).execute()
-    return result.data[0] if result.data else None
+    return _get_row_by_id("subjects", subject_id)
 
 def get_chapter_by_id(chapter_id):
     """Get chapter by ID."""
-    result = kb.client.table("chapters").select("*").eq("id", chapter_id).execute()
-    return result.data[0] if result.data else None
+    return _get_row_by_id("chapters", chapter_id)
 
 def get_topic_by_id(topic_id):
     """Get topic by ID."""
-    result = kb.client.table("topics").select("*").eq("id", topic_id).execute()
-    return result.data[0] if result.data else None
+    return _get_row_by_id("topics", topic_id)
 
 def get_concept_by_id(concept_id):
     """Get concept by ID."""
-    result = kb.client.table("concepts").select("*").eq("id", concept_id).execute()
-    return result.data[0] if result.data else None
+    return _get_row_by_id("concepts", concept_id)
 
 def get_attribute_by_id(attribute_id):
     """Get attribute by ID."""
-    result = kb.client.table("attributes").select("*").eq("id", attribute_id).execute()
-    return result.data[0] if result.data else None
+    return _get_row_by_id("attributes", attribute_id)
 
 def get_question_by_id(question_id):
     """Get question by ID."""
-    result = kb.client.table("questions").select("*").eq("id", question_id).execute()
-    return result.data[0] if result.data else None
+    return _get_row_by_id("questions", question_id)
+
+# IDs per .in_() filter; larger sets are fetched in several requests so the
+# PostgREST URL stays well under proxy limits
+IN_QUERY_CHUNK_SIZE = 200
+# Independent selects (e.g. chunks not already memoized for the request) run
+# concurrently on this pool, at most this many at a time
+QUERY_MAX_CONCURRENCY = 8
+_query_executor = ThreadPoolExecutor(max_workers=QUERY_MAX_CONCURRENCY, thread_name_prefix="supabase-query")
+
+def _select_in(table, columns, column, values, filters=None):
+    """
+    Get rows of `table` whose `column` is one of `values`, in URL-sized chunks.
+    `filters` adds equality filters (as in cached_select) to every chunk.
+    """
+    values = list(values)
+    chunk_filters = [
+        {**(filters or {}), column: values[start:start + IN_QUERY_CHUNK_SIZE]}
+        for start in range(0, len(values), IN_QUERY_CHUNK_SIZE)
+    ]
+    keys = [_select_key(table, columns, chunk) for chunk in chunk_filters]
+    memo = _query_memo()
+    
+    missing = {key: chunk for key, chunk in zip(keys, chunk_filters) if key not in memo}
+    if len(missing) == 1:
+        (key, chunk), = missing.items()
+        memo[key] = _run_select(table, columns, chunk)
+    elif missing:
+        futures = {
+            key: _query_executor.submit(_run_select, table, columns, chunk)
+            for key, chunk in missing.items()
+        }
+        for key, future in futures.items():
+            memo[key] = future.result()
+    
+    return [row for key in keys for row in memo[key]]
+
+# Bulk inserts are split so that no single request body hits PostgREST's
+# payload or statement timeout limits
+INSERT_CHUNK_SIZE = 1000
+
+def _insert_chunked(table, rows):
+    """
+    Insert `rows` into `table` in chunks, one after another, stopping at the
+    first chunk that fails. Returns (number of rows written, the exception or
+    None); the written rows are always a prefix of `rows`.
+    """
+    written = 0
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        chunk = rows[start:start + INSERT_CHUNK_SIZE]
+        try:
+            kb.client.table(table).insert(chunk).execute()
+        except Exception as e:
+            return written, e
+        written += len(chunk)
+    return written, None
+
+# Attribute rows per topic change only through the attribute endpoints, which
+# clear this cache via invalidate_hierarchy_caches()
+TOPIC_ATTRIBUTES_CACHE_TTL = 60  # seconds
+_topic_attributes_cache = TTLCache(maxsize=10_000, ttl=TOPIC_ATTRIBUTES_CACHE_TTL)
+_topic_attributes_lock = threading.Lock()
+
+def get_attributes_by_topic(topic_ids):
+    """
+    Get {topic_id: [attribute rows (id, name, description, topic_id)]} for the
+    given topics, querying Supabase only for topics not cached. Each topic's
+    rows are ordered by attribute ID (as get_question_qmatrix orders them), so
+    q-matrix indices are stable. The rows are shared between requests, so
+    treat them as read-only.
+    """
+    topic_ids = list(dict.fromkeys(topic_ids))
+    with _topic_attributes_lock:
+        found = {topic_id: _topic_attributes_cache.get(topic_id) for topic_id in topic_ids}
+
+    missing = [topic_id for topic_id, attributes in found.items() if attributes is None]
+    if missing:
+        fetched = {topic_id: [] for topic_id in missing}
+        for attr in _select_in("attributes", "id, name, description, topic_id", "topic_id", missing):
+            fetched[attr["topic_id"]].append(attr)
+        for attributes in fetched.values():
+            attributes.sort(key=lambda attr: attr["id"])
+        with _topic_attributes_lock:
+            _topic_attributes_cache.update(fetched)
+        found.update(fetched)
+
+    return found
+
+# (table, parent column) steps from each level down to its subjects; exams
+# reach theirs directly (competitive) or through their classes (school)
+LEVEL_SUBJECT_PATHS = {
+    "exam": ((("subjects", "exam_id"),), (("classes", "exam_id"), ("subjects", "class_id"))),
+    "class": ((("subjects", "class_id"),),),
+}
+# ... and from subjects (or each lower level) down to topics
+LEVEL_TOPIC_PATHS = {
+    "subject": (("chapters", "subject_id"), ("topics", "chapter_id")),
+    "chapter": (("topics", "chapter_id"),),
+    "topic": (),
+}
+
+# The attribute list of a hierarchy node is the same for every page of its
+# questions; kept until the TTL runs out or invalidate_hierarchy_caches()
+LEVEL_ATTRIBUTES_CACHE_TTL = 120  # seconds
+_level_attributes_cache = TTLCache(maxsize=1000, ttl=LEVEL_ATTRIBUTES_CACHE_TTL)
+_level_attributes_lock = threading.Lock()
+
+def get_level_attributes(level, item_id):
+    """
+    Get (attributes, order, sorted_ids) for all topics under a hierarchy item:
+    the attribute rows in q-vector column order, and their IDs sorted as a
+    NumPy array with `order` mapping each sorted position back to its column.
+    The result is shared between requests, so treat it as read-only.
+    """
+    key = (level, item_id)
+    with _level_attributes_lock:
+        hit = _level_attributes_cache.get(key)
+        generation = _hierarchy_cache_generation
+    if hit is not None:
+        return hit
+
+    if level in LEVEL_SUBJECT_PATHS:
+        subject_ids = []
+        for path in LEVEL_SUBJECT_PATHS[level]:
+            ids = [item_id]
+            for table, parent_column in path:
+                ids = [row["id"] for row in _select_in(table, "id", parent_column, ids)]
+            subject_ids.extend(ids)
+        ids = subject_ids
+        level = "subject"
+    else:
+        ids = [item_id]
+    for table, parent_column in LEVEL_TOPIC_PATHS[level]:
+        ids = [row["id"] for row in _select_in(table, "id", parent_column, ids)]
+    topic_ids = ids
+
+    attributes = [
+        attr for topic_attributes in get_attributes_by_topic(topic_ids).values() for attr in topic_attributes
+    ]
+    attribute_ids = np.array([attr["id"] for attr in attributes], dtype=str)
+    order = np.argsort(attribute_ids)
+    level_attributes = (attributes, order, attribute_ids[order])
+
+    with _level_attributes_lock:
+        if generation == _hierarchy_cache_generation:
+            _level_attributes_cache[key] = level_attributes
+    return level_attributes
+
+def get_true_attribute_ids(questions):
+    """
+    Get {question_id: set of attribute IDs marked true in its q-matrix}, read
+    from the denormalized question_attribute_ids table; q_matrix is only
+    queried for questions without a row there (or when the table is missing).
+    """
+    question_ids = [question["id"] for question in questions]
+    true_ids = {}
+    try:
+        for row in _select_in("question_attribute_ids", "question_id, attribute_ids", "question_id", question_ids):
+            true_ids[row["question_id"]] = set(row["attribute_ids"])
+    except Exception:
+        # Without the table (migration STEP 8), read everything from q_matrix
+        pass
+
+    unresolved = [question_id for question_id in question_ids if question_id not in true_ids]
+    for entry in _select_in("q_matrix", "question_id, attribute_id", "question_id", unresolved, {"value": True}):
+        true_ids.setdefault(entry["question_id"], set()).add(entry["attribute_id"])
+    return true_ids
+
+def attach_topic_attributes(questions):
+    """
+    Add "attributes" (every attribute of the question's topic, with its q-matrix
+    value) and "q_matrix" (indices of the attributes set to true) to each question.
+    Attributes and q-matrix rows are fetched for all questions at once rather
+    than per question.
+    """
+    attributes_by_topic = get_attributes_by_topic(q["topic_id"] for q in questions if q.get("topic_id"))
+
+    true_ids_by_question = get_true_attribute_ids([q for q in questions if q.get("topic_id")])
+
+    for question in questions:
+        true_ids = true_ids_by_question.get(question["id"], ())
+        formatted_attributes = []
+        q_matrix_indices = []
+        for i, attr in enumerate(attributes_by_topic.get(question.get("topic_id"), ())):
+            value = attr["id"] in true_ids
+            formatted_attributes.append({
+                "id": attr["id"],
+                "name": attr["name"],
+                "description": attr["description"],
+                "value": value
+            })
+            if value:
+                q_matrix_indices.append(i)
+
+        question["attributes"] = formatted_attributes
+        question["q_matrix"] = q_matrix_indices
+
+    return questions
+
+def get_question_attributes(question_ids):
+    """
+    Get the attributes marked true in each question's q-matrix with one call to
+    the questions_with_attrs database function.
+    Returns {question_id: [{"id", "name", "description"}, ...]}.
+    """
+    if not question_ids:
+        return {}
+    result = kb.client.rpc("questions_with_attrs", {"qids": list(question_ids)}).execute()
+    attributes_by_question = defaultdict(list)
+    for row in result.data or []:
+        attributes_by_question[row["question_id"]].append({
+            "id": row["attribute_id"],
+            "name": row["name"],
+            "description": row["description"]
+        })
+    return attributes_by_question
+
+HIERARCHY_LEVELS = ("exam", "subject", "chapter", "topic", "concept")
+
+# QuestionFilter for a single hierarchy item, per level; route parameters are
+# plain strings, so the filters are built with construct() and skip validation
+_LEVEL_CTOR = {
+    level: (lambda item_id, field=f"{level}_id": QuestionFilter.construct(**{field: item_id}))
+    for level in HIERARCHY_LEVELS
+}
+
+def count_questions_by(level, ids):
+    """
+    Count questions per hierarchy item with one call to the count_questions_by
+    database function, which reads the trigger-maintained question_count
+    columns. Returns {id: count}, 0 for IDs without questions.
+    """
+    if not ids:
+        return {}
+    result = kb.client.rpc("count_questions_by", {"col": f"{level}_id", "ids": list(ids)}).execute()
+    counts = {row["id"]: row["cnt"] for row in result.data or []}
+    return {item_id: counts.get(item_id, 0) for item_id in ids}
+
+# Event loops are created once per thread and reused across requests. The
+# service coroutines do blocking Supabase I/O, so a single shared loop thread
+# would serialize every request behind it.
+_thread_loops = threading.local()
 
 # Helper function to run async functions
 def run_async(coro):
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    loop = getattr(_thread_loops, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        _thread_loops.loop = loop
+    return loop.run_until_complete(coro)
+
+def run_inline(coro):
+    """
+    Run a coroutine that never suspends to completion on the calling thread,
+    without an event loop. The PYQ session coroutines only await each other
+    around blocking Supabase calls, so stepping them once is enough.
+    """
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coro.close()
+    raise RuntimeError("run_inline() coroutine suspended; use run_async() instead")
+
+def ojsonify(obj, status=200):
+    """jsonify() replacement backed by orjson for large, read-heavy responses."""
+    return Response(
+        orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY),
+        status=status,
+        mimetype='application/json'
+    )
+
+def ojsonify_stream(head, key, items, tail=None):
+    """
+    Stream a JSON object as it is encoded: the fields in `head`, then the
+    list `key` with each of `items` encoded one at a time, then the fields
+    in `tail`. `items` may be a generator, so the full list is never held
+    as one encoded body.
+    """
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def generate():
+        opening = orjson.dumps(head, option=option)[:-1]
+        yield opening + (b',' if head else b'') + orjson.dumps(key) + b':['
+        separator = b''
+        for item in items:
+            yield separator + orjson.dumps(item, option=option)
+            separator = b','
+        yield b']' + (b',' + orjson.dumps(tail, option=option)[1:] if tail else b'}')
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+def respond(obj, status=200):
+    """
+    Encode a response as MessagePack when the client sends
+    'Accept: application/msgpack', otherwise as JSON via ojsonify().
+    """
+    if 'application/msgpack' in request.headers.get('Accept', ''):
+        response = Response(msgspec.msgpack.encode(obj), status=status, mimetype='application/msgpack')
+    else:
+        response = ojsonify(obj, status)
+    response.vary.add('Accept')
+    return response
+
+def api_endpoint(handler):
+    """
+    Wrap a handler that returns a service result dict ({"success": bool, ...}):
+    the result is sent with respond() as 200 or 400 depending on "success",
+    Response objects pass through, and exceptions become a logged 500.
+    """
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        try:
+            result = handler(*args, **kwargs)
+            if isinstance(result, Response):
+                return result
+            return respond(result, 200 if result.get("success") else 400)
+        except Exception as e:
+            logger.exception("%s failed", handler.__name__)
+            return jsonify({"error": str(e)}), 500
+    return wrapper
+
+def respond_if_modified(obj, fingerprint=None):
+    """
+    respond() for polled 200 responses, tagged with a weak ETag over the payload
+    (or over `fingerprint` when fields that always change should not count).
+    Returns 304 Not Modified when the client's If-None-Match already matches.
+    """
+    digest = hashlib.blake2b(
+        orjson.dumps(obj if fingerprint is None else fingerprint,
+                     option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS),
+        digest_size=8
+    ).hexdigest()
+    if request.if_none_match.contains_weak(digest):
+        response = Response(status=304)
+        response.vary.add('Accept')
+    else:
+        response = respond(obj, 200)
+    response.set_etag(digest, weak=True)
+    return response
+
+# Hierarchy, attribute and question-count reads change far less often than they
+# are requested; @cached_get keeps their 200 responses per path and query string
+# until the TTL runs out or a write calls invalidate_hierarchy_caches()
+HIERARCHY_CACHE_TTL = 300  # seconds
+_hierarchy_response_cache = TTLCache(maxsize=2048, ttl=HIERARCHY_CACHE_TTL)
+_hierarchy_response_lock = threading.Lock()
+_hierarchy_cache_generation = 0
+
+# Encoded single-question responses (question, topic attributes and q-matrix),
+# dropped per question by the image endpoints and entirely on attribute writes
+QUESTION_RESPONSE_CACHE_TTL = 300  # seconds
+_question_response_cache = TTLCache(maxsize=10_000, ttl=QUESTION_RESPONSE_CACHE_TTL)
+_question_response_lock = threading.Lock()
+# Bumped on every invalidation, single-question or full, so a response being
+# rendered at that moment is not stored afterwards
+_question_response_generation = 0
+
+def invalidate_question_response_cache(question_id=None):
+    """Drop one cached question response, or all of them when no ID is given."""
+    global _question_response_generation
+    with _question_response_lock:
+        _question_response_generation += 1
+        if question_id is None:
+            _question_response_cache.clear()
+        else:
+            _question_response_cache.pop(question_id, None)
+
+def invalidate_hierarchy_caches():
+    """Drop cached hierarchy reads after the hierarchy, attributes or questions change."""
+    global _hierarchy_cache_generation
+    item_bank_service.invalidate_cache()
+    invalidate_question_response_cache()
+    with _topic_attributes_lock:
+        _topic_attributes_cache.clear()
+    with _level_attributes_lock:
+        _level_attributes_cache.clear()
+    with _hierarchy_response_lock:
+        _hierarchy_cache_generation += 1
+        _hierarchy_response_cache.clear()
+
+def cached_get(handler):
+    """
+    Serve repeated GETs of the same URL from _hierarchy_response_cache.
+    Responses computed while a write invalidated the cache are not stored.
+    Cached bodies carry a weak ETag, so clients revalidating with
+    If-None-Match get 304 Not Modified without the payload.
+    """
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        key = request.full_path
+        with _hierarchy_response_lock:
+            hit = _hierarchy_response_cache.get(key)
+            generation = _hierarchy_cache_generation
+        if hit is not None:
+            body, mimetype, etag = hit
+            response = Response(body, mimetype=mimetype)
+            response.set_etag(etag, weak=True)
+            return response.make_conditional(request)
+
+        response = app.make_response(handler(*args, **kwargs))
+        if response.status_code == 200 and not response.direct_passthrough:
+            body = response.get_data()
+            etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+            with _hierarchy_response_lock:
+                if generation == _hierarchy_cache_generation:
+                    _hierarchy_response_cache[key] = (body, response.mimetype, etag)
+            response.set_etag(etag, weak=True)
+            response = response.make_conditional(request)
+        return response
+    return wrapper
+
+# PYQ filter options change only when PYQs are uploaded; the serialized
+# response is cached briefly and dropped by invalidate_pyq_caches()
+PYQ_FILTER_OPTIONS_TTL = 120  # seconds
+PYQ_FILTER_OPTIONS_STALE_TTL = 600  # seconds a shared cache may serve stale while revalidating
+_pyq_filter_options_cache = TTLCache(maxsize=1, ttl=PYQ_FILTER_OPTIONS_TTL)
+_pyq_filter_options_lock = threading.Lock()
+
+def invalidate_pyq_caches():
+    """Drop cached data derived from PYQs after an upload."""
+    invalidate_hierarchy_caches()
+    pyq_retriever_service.invalidate_question_cache()
+    with _pyq_filter_options_lock:
+        _pyq_filter_options_cache.clear()
+
+# Identical answer submissions within this window (double clicks, client
+# retries) get the first submission's result instead of being re-recorded.
+# The key is reserved with a Future before submitting, so concurrent
+# duplicates wait for the first submission (at most SUBMIT_DEDUP_WAIT)
+SUBMIT_DEDUP_WINDOW = 5  # seconds
+SUBMIT_DEDUP_WAIT = 30  # seconds
+_recent_submissions = TTLCache(maxsize=4096, ttl=SUBMIT_DEDUP_WINDOW)
+_recent_submissions_lock = threading.Lock()
+
+def _release_submission(dedup_key, pending):
+    """Forget a reserved submission key, unless it has since been reserved again."""
+    with _recent_submissions_lock:
+        if _recent_submissions.get(dedup_key) is pending:
+            del _recent_submissions[dedup_key]
+
+# Background jobs for long-running uploads; finished jobs stay pollable for an hour
+UPLOAD_JOB_TTL = 3600  # seconds
+_upload_job_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pyq-upload-job")
+# LLM Batch API uploads mostly sleep between polls for up to 24h, so they get
+# their own pool and never hold the workers Excel/bulk uploads run on
+BATCH_JOB_MAX_CONCURRENCY = 16
+_batch_job_executor = ThreadPoolExecutor(max_workers=BATCH_JOB_MAX_CONCURRENCY, thread_name_prefix="pyq-batch-job")
+_upload_jobs = TTLCache(maxsize=1024, ttl=UPLOAD_JOB_TTL)
+_upload_jobs_lock = threading.Lock()
+
+def _set_upload_job(job_id, **fields):
+    with _upload_jobs_lock:
+        job = dict(_upload_jobs.get(job_id, {}))
+        job.update(fields)
+        _upload_jobs[job_id] = job
+
+def _run_upload_job(job_id, work):
+    """Run a PYQ upload in the background and record its outcome."""
+    _set_upload_job(job_id, status="started")
     try:
-        return loop.run_until_complete(coro)
-    finally:
-        loop.close()
+        result = work(job_id)
+        invalidate_pyq_caches()
+        _set_upload_job(job_id, status="finished", result=result)
+    except Exception as e:
+        traceback.print_exc()
+        _set_upload_job(job_id, status="failed", error=str(e))
+
+def _start_upload_job(work, executor=_upload_job_executor):
+    """Queue work(job_id) as a background upload job on `executor` and return its job ID."""
+    job_id = str(uuid.uuid4())
+    _set_upload_job(job_id, status="queued")
+    executor.submit(_run_upload_job, job_id, work)
+    return job_id
+
+def _upload_job_response(job_id):
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/pyq/upload/status/{job_id}"
+    }), 202
+
 
 def _xlsx_column_letter(index: int) -> str:
     """Convert zero-based column index to Excel column letters."""
@@ -144,20 +655,21 @@ def _xlsx_column_letter(index: int) -> str:
 
 def _build_worksheet_xml(headers, rows):
     """Build minimal worksheet XML with inline strings."""
+    rows = list(rows)
     rows_xml = []
 
-    def cell_xml(col_idx: int, row_idx: int, value) -> str:
-        col_letter = _xlsx_column_letter(col_idx)
-        cell_ref = f"{col_letter}{row_idx}"
-        text = '' if value is None else str(value)
-        return f'<c r="{cell_ref}" t="inlineStr"><is><t>{escape(text)}</t></is></c>'
-
-    header_cells = ''.join(cell_xml(col_idx, 1, header) for col_idx, header in enumerate(headers))
-    rows_xml.append(f'<row r="1">{header_cells}</row>')
+    # Column letters are the same for every row, so compute them once
+    width = max([len(headers)] + [len(row) for row in rows])
+    col_letters = [_xlsx_column_letter(col_idx) for col_idx in range(width)]
 
-    for row_offset, row in enumerate(rows, start=2):
-        data_cells = ''.join(cell_xml(col_idx, row_offset, value) for col_idx, value in enumerate(row))
-        rows_xml.append(f'<row r="{row_offset}">{data_cells}</row>')
+    # Header row is row 1; cells are formatted inline rather than through a
+    # per-cell helper call
+    for row_idx, row in enumerate([headers] + rows, start=1):
+        cells = ''.join([
+            f'<c r="{letter}{row_idx}" t="inlineStr"><is><t>{escape("" if value is None else str(value))}</t></is></c>'
+            for letter, value in zip(col_letters, row)
+        ])
+        rows_xml.append(f'<row r="{row_idx}">{cells}</row>')
 
     sheet_data = ''.join(rows_xml)
     return ('<?xml version="1.0" encoding="UTF-8"?>'
@@ -167,89 +679,91 @@ def _build_worksheet_xml(headers, rows):
             '</worksheet>')
 
 
+_XLSX_ENTRY_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# Package parts that are the same in every generated workbook
+_XLSX_STATIC_PARTS = (
+    ('[Content_Types].xml',
+     b'<?xml version="1.0" encoding="UTF-8"?>'
+     b'<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+     b'<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+     b'<Default Extension="xml" ContentType="application/xml"/>'
+     b'<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+     b'<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+     b'</Types>'),
+    ('_rels/.rels',
+     b'<?xml version="1.0" encoding="UTF-8"?>'
+     b'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     b'<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+     b'</Relationships>'),
+    ('xl/_rels/workbook.xml.rels',
+     b'<?xml version="1.0" encoding="UTF-8"?>'
+     b'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     b'<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+     b'</Relationships>'),
+)
+
 def _build_xlsx(headers, rows, sheet_name="PYQ_Template") -> BytesIO:
     """Create an in-memory XLSX file with the provided headers and rows."""
     output = BytesIO()
-    with ZipFile(output, 'w') as zf:
-        zf.writestr('[Content_Types].xml',
-                    '<?xml version="1.0" encoding="UTF-8"?>'
-                    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
-                    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
-                    '<Default Extension="xml" ContentType="application/xml"/>'
-                    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
-                    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
-                    '</Types>')
-        zf.writestr('_rels/.rels',
-                    '<?xml version="1.0" encoding="UTF-8"?>'
-                    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
-                    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
-                    '</Relationships>')
-        zf.writestr('xl/_rels/workbook.xml.rels',
-                    '<?xml version="1.0" encoding="UTF-8"?>'
-                    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
-                    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
-                    '</Relationships>')
-        zf.writestr('xl/workbook.xml',
-                    '<?xml version="1.0" encoding="UTF-8"?>'
-                    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
-                    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
-                    '<sheets>'
-                    f'<sheet name="{sheet_name}" sheetId="1" r:id="rId1"/>'
-                    '</sheets>'
-                    '</workbook>')
-        zf.writestr('xl/worksheets/sheet1.xml', _build_worksheet_xml(headers, rows))
+    with ZipFile(output, 'w', compression=ZIP_DEFLATED, compresslevel=6) as zf:
+        # Fixed entry timestamps keep the bytes (and so ETags) identical across processes
+        def writestr(name, data):
+            zf.writestr(ZipInfo(name, date_time=_XLSX_ENTRY_DATE_TIME), data,
+                        compress_type=ZIP_DEFLATED, compresslevel=6)
+
+        for name, data in _XLSX_STATIC_PARTS:
+            writestr(name, data)
+        writestr('xl/workbook.xml',
+                 '<?xml version="1.0" encoding="UTF-8"?>'
+                 '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                 '<sheets>'
+                 f'<sheet name="{sheet_name}" sheetId="1" r:id="rId1"/>'
+                 '</sheets>'
+                 '</workbook>')
+        writestr('xl/worksheets/sheet1.xml', _build_worksheet_xml(headers, rows))
     output.seek(0)
     return output
 
-# Helper function to build subject subtree (shared between both paths)
-def build_subject_tree_node(subject):
-    """Build a subject node with its chapters, topics hierarchy."""
-    subject_node = {
-        "id": subject["id"],
-        "name": subject["name"],
-        "description": subject["description"],
-        "type": "subject",
-        "children": []
-    }
-
-    # Get chapters for this subject
-    chapters = get_chapters(subject["id"])
-    for chapter in chapters:
-        chapter_node = {
-            "id": chapter["id"],
-            "name": chapter["name"],
-            "description": chapter["description"],
-            "type": "chapter",
-            "children": []
-        }
-
-        # Get topics for this chapter
-        topics = get_topics(chapter["id"])
-        for topic in topics:
-            topic_node = {
-                "id": topic["id"],
-                "name": topic["name"],
-                "description": topic["description"],
-                "type": "topic",
-                "children": []
-            }
-
-            # Get concepts for this topic (if still using concepts)
-            concepts = get_concepts(topic["id"])
-            for concept in concepts:
-                concept_node = {
-                    "id": concept["id"],
-                    "name": concept["name"],
-                    "description": concept["description"],
-                    "type": "concept"
-                }
-                topic_node["children"].append(concept_node)
-
-            chapter_node["children"].append(topic_node)
-
-        subject_node["children"].append(chapter_node)
-
-    return subject_node
+# The PYQ upload template is constant, so it is built once at import time and
+# served with a content ETag that lets clients revalidate instead of re-downloading
+PYQ_TEMPLATE_HEADERS = [
+    'content', 'options', 'correct_answer', 'year', 'exam_session',
+    'paper_code', 'question_number', 'marks_allocated', 'time_allocated',
+    'solution', 'source', 'tags', 'difficulty_level', 'question_type',
+    'exam_id', 'subject_id', 'chapter_id', 'topic_id', 'concept_id'
+]
+PYQ_TEMPLATE_ROWS = [[
+    'Sample question content here',
+    '["Option A", "Option B", "Option C", "Option D"]',
+    'Option A',
+    2023,
+    'January',
+    'PAPER-001',
+    'Q1',
+    1.0,
+    2,
+    'Detailed solution here',
+    'Official',
+    'tag1,tag2',
+    'Medium',
+    'MCQ',
+    '', '', '', '', ''
+]]
+PYQ_TEMPLATE_MAX_AGE = 86400  # seconds
+_PYQ_TEMPLATE_BYTES = _build_xlsx(PYQ_TEMPLATE_HEADERS, PYQ_TEMPLATE_ROWS).getvalue()
+_PYQ_TEMPLATE_ETAG = hashlib.md5(_PYQ_TEMPLATE_BYTES).hexdigest()
+
+def get_hierarchy_tree(exam_ids=None):
+    """
+    Get exam nodes with their full subtrees, built by the get_hierarchy_tree
+    database function in one call (all exams unless exam_ids is given).
+    School exams: Exam → Class → Subject → Chapter → Topic
+    Competitive exams: Exam → Subject → Chapter → Topic
+    """
+    params = {} if exam_ids is None else {"exam_ids": list(exam_ids)}
+    return kb.client.rpc("get_hierarchy_tree", params).execute().data or []
 
 #=====================================================
 # PYQ UPLOAD ENDPOINTS
@@ -269,6 +783,7 @@ def upload_single_pyq():
         
         # Upload the question
         result = run_async(pyq_upload_service.upload_single_pyq(pyq_question))
+        invalidate_pyq_caches()
         
         if result["success"]:
             return jsonify(result), 201
@@ -276,13 +791,17 @@ def upload_single_pyq():
             return jsonify(result), 400
             
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/pyq/upload/bulk', methods=['POST'])
 def upload_bulk_pyq():
-    """Upload multiple PYQ questions in bulk."""
+    """
+    Upload multiple PYQ questions in bulk.
+
+    With ?mode=batch the 3PL estimation goes through the LLM Batch API (cheaper,
+    completes within 24h); the upload then runs as a background job.
+    """
     try:
         data = request.json
         
@@ -298,13 +817,26 @@ def upload_bulk_pyq():
             except Exception as e:
                 return jsonify({"error": f"Invalid question data: {str(e)}"}), 400
         
+        if request.args.get('mode') == 'batch':
+            if not pyq_upload_service.llm_service:
+                return jsonify({"error": "Batch mode requires the LLM service to be enabled"}), 400
+            if not pyq_upload_service.llm_service.batch_enabled:
+                return jsonify({"error": "Batch mode requires LLM_BATCH_API_KEY to be set"}), 400
+            
+            def upload_via_batch(job_id):
+                # Each poll refreshes the job entry, so it does not expire while the batch runs
+                on_poll = lambda batch: _set_upload_job(job_id, batch_id=batch["id"], batch_status=batch["status"])
+                return run_async(pyq_upload_service.upload_bulk_pyq_batch(pyq_questions, on_poll=on_poll))
+            
+            return _upload_job_response(_start_upload_job(upload_via_batch, _batch_job_executor))
+        
         # Upload questions in bulk
         result = run_async(pyq_upload_service.upload_bulk_pyq(pyq_questions))
+        invalidate_pyq_caches()
         
         return jsonify(result), 200
         
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
@@ -348,26 +880,31 @@ def upload_pyq_from_excel():
                 'concept_id': 'concept_id'
             }
         
-        # Save file temporarily
-        file_path = f"/tmp/{uuid.uuid4()}_{file.filename}"
-        file.save(file_path)
+        # Keep the workbook in memory; the upload stream is closed once the request ends
+        workbook = BytesIO(file.read())
         
-        # Upload from Excel
-        result = run_async(pyq_upload_service.upload_from_excel(file_path, mapping_config))
-        
-        # Clean up temporary file
-        try:
-            os.remove(file_path)
-        except:
-            pass
+        # Upload from Excel in the background; clients poll the status endpoint
+        job_id = _start_upload_job(
+            lambda job_id: run_async(pyq_upload_service.upload_from_excel_stream(workbook, mapping_config))
+        )
         
-        return jsonify(result), 200
+        return _upload_job_response(job_id)
         
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/pyq/upload/status/<job_id>', methods=['GET'])
+def get_pyq_upload_status(job_id):
+    """Get the status (and result, once finished) of a background PYQ upload."""
+    with _upload_jobs_lock:
+        job = _upload_jobs.get(job_id)
+    
+    if job is None:
+        return jsonify({"error": "Upload job not found"}), 404
+    
+    return jsonify({"job_id": job_id, **job}), 200
+
 @app.route('/api/pyq/statistics', methods=['GET'])
 def get_pyq_statistics():
     """Get PYQ upload statistics."""
@@ -390,7 +927,7 @@ def get_pyq_statistics():
         # Get statistics
         stats = run_async(pyq_upload_service.get_pyq_statistics(filters))
         
-        return jsonify(stats), 200
+        return ojsonify(stats)
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -425,7 +962,7 @@ def search_pyq_questions():
         # Search questions
         result = run_async(pyq_upload_service.search_pyq_questions(filters, page, page_size))
         
-        return jsonify(result), 200
+        return ojsonify(result)
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -452,140 +989,125 @@ def create_pyq_session():
             return jsonify({"error": "user_id is required"}), 400
         
         # Create filters object
-        filters = PYQSessionFilter(**filters_data)
+        try:
+            filters = msgspec.convert(filters_data, PYQSessionFilter, strict=False)
+        except msgspec.ValidationError as e:
+            return jsonify({"error": f"Invalid filters: {e}"}), 400
         
         # Create session
-        result = run_async(pyq_retriever_service.create_session(
+        result = run_inline(pyq_retriever_service.create_session(
             user_id, session_name, filters, time_limit
         ))
         
         if result["success"]:
-            return jsonify(result), 201
+            return ojsonify(result, 201)
         else:
-            return jsonify(result), 400
+            return ojsonify(result, 400)
             
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("create_pyq_session failed")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/pyq/session/<session_id>/current', methods=['GET'])
+@api_endpoint
 def get_current_question(session_id):
     """Get the current question for a session."""
-    try:
-        result = run_async(pyq_retriever_service.get_current_question(session_id))
-        
-        if result["success"]:
-            return jsonify(result), 200
-        else:
-            return jsonify(result), 400
-            
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return run_inline(pyq_retriever_service.get_current_question(session_id))
 
 @app.route('/api/pyq/session/<session_id>/submit', methods=['POST'])
 def submit_answer(session_id):
     """Submit an answer for the current question."""
     try:
-        data = request.json
-        
-        if not data:
+        try:
+            submission = msgspec.json.decode(request.get_data(), type=SubmitAnswerRequest, strict=False)
+        except msgspec.ValidationError as e:
+            return jsonify({"error": f"Invalid request data: {e}"}), 400
+        except msgspec.DecodeError:
             return jsonify({"error": "Invalid request data"}), 400
         
-        question_id = data.get('question_id')
-        user_answer = data.get('user_answer')
-        time_taken = data.get('time_taken', 0)  # in seconds
-        
-        if not question_id or user_answer is None:
+        if not submission.question_id:
             return jsonify({"error": "question_id and user_answer are required"}), 400
         
-        # Submit answer
-        result = run_async(pyq_retriever_service.submit_answer(
-            session_id, question_id, str(user_answer), int(time_taken)
-        ))
-        
-        if result["success"]:
-            return jsonify(result), 200
-        else:
-            return jsonify(result), 400
+        user_answer = str(submission.user_answer)
+        dedup_key = (session_id, submission.question_id, user_answer)
+        with _recent_submissions_lock:
+            pending = _recent_submissions.get(dedup_key)
+            duplicate = pending is not None
+            if not duplicate:
+                pending = Future()
+                _recent_submissions[dedup_key] = pending
+        
+        if duplicate:
+            # Same answer submitted moments ago (or still in flight): reuse its outcome
+            result = pending.result(timeout=SUBMIT_DEDUP_WAIT)
+            if result["success"]:
+                return respond({**result, "duplicate": True}, 200)
+            return respond(result, 400)
+        
+        # Submit answer; a failed submission releases the key so it can be retried
+        try:
+            result = run_inline(pyq_retriever_service.submit_answer(
+                session_id, submission.question_id, user_answer, int(submission.time_taken)
+            ))
+        except Exception as e:
+            _release_submission(dedup_key, pending)
+            pending.set_exception(e)
+            raise
+        if not result["success"]:
+            _release_submission(dedup_key, pending)
+        pending.set_result(result)
+        
+        return respond(result, 200 if result["success"] else 400)
             
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/pyq/session/<session_id>/navigate/<direction>', methods=['POST'])
+@api_endpoint
 def navigate_question(session_id, direction):
     """Navigate to next/previous question."""
-    try:
-        result = run_async(pyq_retriever_service.navigate_to_question(session_id, direction))
-        
-        if result["success"]:
-            return jsonify(result), 200
-        else:
-            return jsonify(result), 400
-            
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return run_inline(pyq_retriever_service.navigate_to_question(session_id, direction))
 
 @app.route('/api/pyq/session/<session_id>/jump/<int:question_index>', methods=['POST'])
+@api_endpoint
 def jump_to_question(session_id, question_index):
     """Jump to a specific question by index."""
-    try:
-        result = run_async(pyq_retriever_service.jump_to_question(session_id, question_index))
-        
-        if result["success"]:
-            return jsonify(result), 200
-        else:
-            return jsonify(result), 400
-            
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return run_inline(pyq_retriever_service.jump_to_question(session_id, question_index))
 
 @app.route('/api/pyq/session/<session_id>/progress', methods=['GET'])
+@api_endpoint
 def get_session_progress(session_id):
     """Get detailed session progress."""
-    try:
-        result = run_async(pyq_retriever_service.get_session_progress(session_id))
-        
-        if result["success"]:
-            return jsonify(result), 200
-        else:
-            return jsonify(result), 400
-            
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    result = run_inline(pyq_retriever_service.get_session_progress(session_id))
+    if not result["success"]:
+        return result
+
+    # session_duration grows on every call; leave it out of the ETag
+    time_stats = {k: v for k, v in result["time_stats"].items() if k != "session_duration"}
+    return respond_if_modified(result, fingerprint={**result, "time_stats": time_stats})
 
 @app.route('/api/pyq/session/<session_id>/pause', methods=['POST'])
+@api_endpoint
 def pause_session(session_id):
     """Pause a session."""
-    try:
-        result = run_async(pyq_retriever_service.pause_session(session_id))
-        return jsonify(result), 200
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return run_inline(pyq_retriever_service.pause_session(session_id))
 
 @app.route('/api/pyq/session/<session_id>/resume', methods=['POST'])
+@api_endpoint
 def resume_session(session_id):
     """Resume a paused session."""
-    try:
-        result = run_async(pyq_retriever_service.resume_session(session_id))
-        return jsonify(result), 200
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return run_inline(pyq_retriever_service.resume_session(session_id))
 
 @app.route('/api/pyq/sessions/user/<user_id>', methods=['GET'])
+@api_endpoint
 def get_user_sessions(user_id):
     """Get all sessions for a user."""
-    try:
-        status = request.args.get('status', 'all')
-        result = run_async(pyq_retriever_service.get_user_sessions(user_id, status))
-        
-        if result["success"]:
-            return jsonify(result), 200
-        else:
-            return jsonify(result), 400
-            
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    status = request.args.get('status', 'all')
+    result = run_inline(pyq_retriever_service.get_user_sessions(user_id, status))
+    if not result["success"]:
+        return result
+
+    return respond_if_modified(result)
 
 #=====================================================
 # PYQ UTILITY ENDPOINTS
@@ -595,64 +1117,89 @@ def get_user_sessions(user_id):
 def download_pyq_template():
     """Download Excel template for PYQ upload."""
     try:
-        headers = [
-            'content', 'options', 'correct_answer', 'year', 'exam_session',
-            'paper_code', 'question_number', 'marks_allocated', 'time_allocated',
-            'solution', 'source', 'tags', 'difficulty_level', 'question_type',
-            'exam_id', 'subject_id', 'chapter_id', 'topic_id', 'concept_id'
-        ]
-
-        rows = [[
-            'Sample question content here',
-            '["Option A", "Option B", "Option C", "Option D"]',
-            'Option A',
-            2023,
-            'January',
-            'PAPER-001',
-            'Q1',
-            1.0,
-            2,
-            'Detailed solution here',
-            'Official',
-            'tag1,tag2',
-            'Medium',
-            'MCQ',
-            '', '', '', '', ''
-        ]]
-
-        output = _build_xlsx(headers, rows)
-
-        return send_file(
-            output,
+        response = send_file(
+            BytesIO(_PYQ_TEMPLATE_BYTES),
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
-            download_name='pyq_upload_template.xlsx'
+            download_name='pyq_upload_template.xlsx',
+            etag=_PYQ_TEMPLATE_ETAG,
+            max_age=PYQ_TEMPLATE_MAX_AGE
         )
+        response.cache_control.immutable = True
+        return response
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _aggregate_filter_options(metadata_records):
+    """Collect the distinct filter values from PYQ metadata records in one pass."""
+    years, exam_sessions, sources, difficulty_levels, question_types = set(), set(), set(), set(), set()
+    for record in metadata_records:
+        year = record.get("year")
+        if year is not None:
+            years.add(year)
+        exam_session = record.get("exam_session")
+        if exam_session:
+            exam_sessions.add(exam_session)
+        source = record.get("source")
+        if source:
+            sources.add(source)
+        difficulty_level = record.get("difficulty_level")
+        if difficulty_level:
+            difficulty_levels.add(difficulty_level)
+        question_type = record.get("question_type")
+        if question_type:
+            question_types.add(question_type)
+
+    return {
+        "years": sorted(years),
+        "exam_sessions": sorted(exam_sessions),
+        "sources": sorted(sources),
+        "difficulty_levels": sorted(difficulty_levels),
+        "question_types": sorted(question_types)
+    }
+
+def _filter_options_response(body, etag):
+    """Filter options response that shared caches may keep and revalidate by ETag."""
+    response = Response(body, status=200, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = PYQ_FILTER_OPTIONS_TTL
+    response.cache_control['stale-while-revalidate'] = str(PYQ_FILTER_OPTIONS_STALE_TTL)
+    return response.make_conditional(request)
+
 @app.route('/api/pyq/filters/options', methods=['GET'])
 def get_pyq_filter_options():
     """Get available filter options for PYQ sessions."""
     try:
-        metadata_records = []
+        with _pyq_filter_options_lock:
+            cached = _pyq_filter_options_cache.get("options")
+        if cached is not None:
+            return _filter_options_response(*cached)
+
         try:
-            result = kb.client.table("pyq_metadata").select("*").execute()
-            metadata_records = result.data or []
+            # Distinct values are computed in the database (get_pyq_filter_options)
+            result = kb.client.rpc("get_pyq_filter_options", {}).execute()
+            filter_options = result.data
         except Exception:
-            fallback_records = getattr(pyq_upload_service, 'fallback_records', [])
-            metadata_records = [record.get('metadata', {}) for record in fallback_records]
-
-        filter_options = {
-            "years": sorted({record.get("year") for record in metadata_records if record.get("year") is not None}),
-            "exam_sessions": sorted({record.get("exam_session") for record in metadata_records if record.get("exam_session")}),
-            "sources": sorted({record.get("source") for record in metadata_records if record.get("source")}),
-            "difficulty_levels": sorted({record.get("difficulty_level") for record in metadata_records if record.get("difficulty_level")}),
-            "question_types": sorted({record.get("question_type") for record in metadata_records if record.get("question_type")})
-        }
+            # Without the function, read only the five filter columns and aggregate here
+            try:
+                result = kb.client.table("pyq_metadata").select(
+                    "year,exam_session,source,difficulty_level,question_type"
+                ).execute()
+                metadata_records = result.data or []
+            except Exception:
+                fallback_records = getattr(pyq_upload_service, 'fallback_records', [])
+                metadata_records = (record.get('metadata', {}) for record in fallback_records)
+
+            filter_options = _aggregate_filter_options(metadata_records)
 
-        return jsonify(filter_options), 200
+        body = orjson.dumps(filter_options)
+        etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+        with _pyq_filter_options_lock:
+            _pyq_filter_options_cache["options"] = (body, etag)
+
+        return _filter_options_response(body, etag)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -662,92 +1209,41 @@ def get_pyq_filter_options():
 #=====================================================
 
 # Hierarchical Navigation Endpoints
-@app.route('/api/hierarchy/exam/<exam_id>/question-count', methods=['GET'])
-def get_exam_question_count(exam_id):
-    """Get total question count for a specific exam."""
-    try:
-        count_query = kb.client.table("questions") \
-            .select("id", count="exact") \
-            .eq("exam_id", exam_id)
-        
-        count_result = count_query.execute()
-        
-        return jsonify({
-            "exam_id": exam_id, 
-            "total_question_count": count_result.count
-        })
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-@app.route('/api/hierarchy/subject/<subject_id>/question-count', methods=['GET'])
-def get_subject_question_count(subject_id):
-    """Get total question count for a specific subject."""
-    try:
-        count_query = kb.client.table("questions") \
-            .select("id", count="exact") \
-            .eq("subject_id", subject_id)
-        
-        count_result = count_query.execute()
-        
-        return jsonify({
-            "subject_id": subject_id, 
-            "total_question_count": count_result.count
-        })
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-@app.route('/api/hierarchy/chapter/<chapter_id>/question-count', methods=['GET'])
-def get_chapter_question_count(chapter_id):
-    """Get total question count for a specific chapter."""
-    try:
-        count_query = kb.client.table("questions") \
-            .select("id", count="exact") \
-            .eq("chapter_id", chapter_id)
-        
-        count_result = count_query.execute()
-        
-        return jsonify({
-            "chapter_id": chapter_id, 
-            "total_question_count": count_result.count
-        })
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+@app.route('/api/hierarchy/<level>/question-counts', methods=['POST'])
+def get_question_counts(level):
+    """
+    Get question counts for many items of one hierarchy level in a single call.
 
-@app.route('/api/hierarchy/topic/<topic_id>/question-count', methods=['GET'])
-def get_topic_question_count(topic_id):
-    """Get total question count for a specific topic."""
+    Request body: {"ids": ["...", ...]}
+    Response: {"level": "...", "counts": {"<id>": <count>, ...}}
+    """
     try:
-        count_query = kb.client.table("questions") \
-            .select("id", count="exact") \
-            .eq("topic_id", topic_id)
+        if level not in HIERARCHY_LEVELS:
+            return jsonify({"error": f"Invalid level. Must be one of: {list(HIERARCHY_LEVELS)}"}), 400
         
-        count_result = count_query.execute()
+        data = request.json or {}
+        ids = data.get('ids')
+        if not isinstance(ids, list):
+            return jsonify({"error": "Valid ids array is required"}), 400
         
-        return jsonify({
-            "topic_id": topic_id, 
-            "total_question_count": count_result.count
-        })
+        return jsonify({"level": level, "counts": count_questions_by(level, ids)})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/hierarchy/concept/<concept_id>/question-count', methods=['GET'])
-def get_concept_question_count(concept_id):
-    """Get total question count for a specific concept."""
+@app.route(f"/api/hierarchy/<any({', '.join(HIERARCHY_LEVELS)}):level>/<item_id>/question-count", methods=['GET'])
+@cached_get
+def get_question_count(level, item_id):
+    """Get total question count for one exam, subject, chapter, topic or concept."""
     try:
-        count_query = kb.client.table("questions") \
-            .select("id", count="exact") \
-            .eq("concept_id", concept_id)
-        
-        count_result = count_query.execute()
-        
         return jsonify({
-            "concept_id": concept_id, 
-            "total_question_count": count_result.count
+            f"{level}_id": item_id, 
+            "total_question_count": count_questions_by(level, [item_id])[item_id]
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/hierarchy/exams', methods=['GET'])
+@cached_get
 def get_exams_new():
     """Get all exams with question counts."""
     try:
@@ -760,6 +1256,7 @@ def get_exams_new():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/hierarchy/subjects', methods=['GET'])
+@cached_get
 def get_subjects_new():
     """Get subjects for an exam with question counts."""
     try:
@@ -777,6 +1274,7 @@ def get_subjects_new():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/hierarchy/chapters', methods=['GET'])
+@cached_get
 def get_chapters_new():
     """Get chapters for a subject with question counts."""
     try:
@@ -794,6 +1292,7 @@ def get_chapters_new():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/hierarchy/topics', methods=['GET'])
+@cached_get
 def get_topics_new():
     """Get topics for a chapter with question counts."""
     try:
@@ -811,6 +1310,7 @@ def get_topics_new():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/hierarchy/concepts', methods=['GET'])
+@cached_get
 def get_concepts_new():
     """Get concepts for a topic with question counts."""
     try:
@@ -828,6 +1328,11 @@ def get_concepts_new():
         return jsonify({"error": str(e)}), 500
 
 # Item Bank and Statistics Endpoints
+
+# Difficulty histogram for hierarchy stats: (-inf, -1), [-1, 0), [0, 1), [1, 2), [2, inf)
+DIFFICULTY_BIN_EDGES = [-np.inf, -1, 0, 1, 2, np.inf]
+DIFFICULTY_BIN_LABELS = ("very_easy", "easy", "medium", "hard", "very_hard")
+
 @app.route('/api/hierarchy/<level>/<item_id>/stats', methods=['GET'])
 def get_hierarchy_stats(level, item_id):
     """Get statistics for a hierarchy level item."""
@@ -838,10 +1343,7 @@ def get_hierarchy_stats(level, item_id):
             return jsonify({"error": f"Invalid level. Must be one of: {valid_levels}"}), 400
         
         # Get questions count
-        filter_params = {}
-        filter_params[f"{level}_id"] = item_id
-        
-        question_filter = QuestionFilter(**filter_params)
+        question_filter = _LEVEL_CTOR[level](item_id)
         result = run_async(item_bank_service.get_item_bank(question_filter))
         
         # Calculate statistics
@@ -849,29 +1351,31 @@ def get_hierarchy_stats(level, item_id):
         attributes = result["attributes"]
         q_matrix = result["q_matrix_array"]
         
+        # One array per 3PL parameter; averages, the difficulty histogram and the
+        # per-attribute question counts are computed in NumPy
+        difficulty, discrimination, guessing = (
+            np.fromiter((q.get(param, 0) for q in questions), dtype=np.float64, count=len(questions))
+            for param in ("difficulty", "discrimination", "guessing")
+        )
+        difficulty_counts, _ = np.histogram(difficulty, bins=DIFFICULTY_BIN_EDGES)
+        attribute_question_counts = q_matrix.sum(axis=0).tolist() if attributes else []
+        
         # Basic stats
         stats = {
             "question_count": len(questions),
             "attribute_count": len(attributes),
-            "difficulty_avg": sum(q.get("difficulty", 0) for q in questions) / len(questions) if questions else 0,
-            "discrimination_avg": sum(q.get("discrimination", 0) for q in questions) / len(questions) if questions else 0,
-            "guessing_avg": sum(q.get("guessing", 0) for q in questions) / len(questions) if questions else 0,
+            "difficulty_avg": float(difficulty.mean()) if questions else 0,
+            "discrimination_avg": float(discrimination.mean()) if questions else 0,
+            "guessing_avg": float(guessing.mean()) if questions else 0,
             "attributes": [
-                {"id": attr["id"], "name": attr["name"], "question_count": int(q_matrix[:, i].sum())}
-                for i, attr in enumerate(attributes)
+                {"id": attr["id"], "name": attr["name"], "question_count": int(count)}
+                for attr, count in zip(attributes, attribute_question_counts)
             ],
-            "difficulty_distribution": {
-                "very_easy": len([q for q in questions if q.get("difficulty", 0) < -1]),
-                "easy": len([q for q in questions if -1 <= q.get("difficulty", 0) < 0]),
-                "medium": len([q for q in questions if 0 <= q.get("difficulty", 0) < 1]),
-                "hard": len([q for q in questions if 1 <= q.get("difficulty", 0) < 2]),
-                "very_hard": len([q for q in questions if q.get("difficulty", 0) >= 2])
-            }
+            "difficulty_distribution": dict(zip(DIFFICULTY_BIN_LABELS, difficulty_counts.tolist()))
         }
         
-        return jsonify(stats)
+        return ojsonify(stats)
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
@@ -905,36 +1409,21 @@ def get_item_bank(level, item_id):
         if text_search:
             filter_params["text_search"] = text_search
         
-        # Create question filter
-        question_filter = QuestionFilter(**filter_params)
+        # Create question filter; the values above are already typed
+        question_filter = QuestionFilter.construct(**filter_params)
         
         # Search questions
         result = run_async(item_bank_service.search_questions(question_filter, page, page_size))
         
-        # Get attributes for each question
+        # Get the attributes marked true in each question's q-matrix, for the
+        # whole page in one call
         questions = result["data"]
+        attributes_by_question = get_question_attributes([q["id"] for q in questions])
         for question in questions:
-            q_matrix_result = kb.client.table("q_matrix") \
-                .select("attribute_id, value") \
-                .eq("question_id", question["id"]) \
-                .execute()
-                
-            q_matrix_entries = q_matrix_result.data
-            attribute_ids = [entry["attribute_id"] for entry in q_matrix_entries if entry["value"]]
-            
-            if attribute_ids:
-                attrs_result = kb.client.table("attributes") \
-                    .select("id, name, description") \
-                    .in_("id", attribute_ids) \
-                    .execute()
-                    
-                question["attributes"] = attrs_result.data
-            else:
-                question["attributes"] = []
+            question["attributes"] = attributes_by_question.get(question["id"], [])
         
-        return jsonify(result)
+        return ojsonify(result)
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
@@ -949,14 +1438,10 @@ def search_hierarchy():
         # Use the ItemBankService to search
         results = run_async(item_bank_service.search_hierarchical_structure(query, level))
         
-        # Add question counts
+        # Add question counts for all results in one call
+        counts = count_questions_by(level[:-1], [item["id"] for item in results])
         for item in results:
-            count_result = kb.client.table("questions") \
-                .select("*", count="exact") \
-                .eq(f"{level[:-1]}_id", item["id"]) \
-                .execute()
-                
-            item["question_count"] = count_result.count
+            item["question_count"] = counts[item["id"]]
         
         return jsonify(results)
     except Exception as e:
@@ -1007,22 +1492,15 @@ def export_educdm(level, item_id):
         if level not in valid_levels:
             return jsonify({"error": f"Invalid level. Must be one of: {valid_levels}"}), 400
         
-        # Build filter
-        filter_params = {}
-        filter_params[f"{level}_id"] = item_id
-        
         # Create question filter
-        question_filter = QuestionFilter(**filter_params)
+        question_filter = _LEVEL_CTOR[level](item_id)
         
         # Export data
         result = run_async(item_bank_service.export_educdm_data(question_filter))
         
-        # Convert numpy arrays to lists for JSON serialization
-        result["Q"] = result["Q"].tolist()
-        
-        return jsonify(result)
+        # orjson serializes the Q-matrix array directly, no .tolist() copy
+        return ojsonify(result)
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
@@ -1043,6 +1521,7 @@ def api_add_exam():
         return jsonify({"error": "exam_type must be 'competitive' or 'school'"}), 400
 
     exam = kb.add_exam(name, description, exam_type)
+    invalidate_hierarchy_caches()
     return jsonify(exam), 201
 
 # Class Routes (for School path)
@@ -1061,6 +1540,7 @@ def api_add_class():
 
     try:
         class_obj = kb.add_class(exam_id, name, description, class_number, section)
+        invalidate_hierarchy_caches()
         return jsonify(class_obj), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1119,6 +1599,7 @@ def api_add_subject():
 
     try:
         subject = kb.add_subject(name, description, exam_id, class_id)
+        invalidate_hierarchy_caches()
         return jsonify(subject), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1134,6 +1615,7 @@ def api_add_chapter():
         return jsonify({"error": "Subject ID and name are required"}), 400
     
     chapter = kb.add_chapter(subject_id, name, description)
+    invalidate_hierarchy_caches()
     return jsonify(chapter), 201
 
 @app.route('/api/topics', methods=['POST'])
@@ -1147,6 +1629,7 @@ def api_add_topic():
         return jsonify({"error": "Chapter ID and name are required"}), 400
     
     topic = kb.add_topic(chapter_id, name, description)
+    invalidate_hierarchy_caches()
     return jsonify(topic), 201
 
 @app.route('/api/concepts', methods=['POST'])
@@ -1160,10 +1643,12 @@ def api_add_concept():
         return jsonify({"error": "Topic ID and name are required"}), 400
     
     concept = kb.add_concept(topic_id, name, description)
+    invalidate_hierarchy_caches()
     return jsonify(concept), 201
 
 # Attribute Routes
 @app.route('/api/hierarchy/attributes', methods=['GET'])
+@cached_get
 def api_get_attributes():
     concept_id = request.args.get('concept_id')
     if not concept_id:
@@ -1186,22 +1671,22 @@ def create_attribute():
             return jsonify({"error": "Failed to create attribute"}), 500
             
         attribute = result.data[0]
+        invalidate_hierarchy_caches()
         
         return jsonify(attribute), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/topic/<topic_id>/attributes', methods=['GET'])
+@cached_get
 def get_topic_attributes(topic_id):
     """Get all attributes for a topic."""
     try:
         # Get attributes for this topic
-        result = kb.client.table("attributes") \
-            .select("id, name, description") \
-            .eq("topic_id", topic_id) \
-            .execute()
-
-        attributes = result.data
+        attributes = [
+            {"id": attr["id"], "name": attr["name"], "description": attr["description"]}
+            for attr in get_attributes_by_topic([topic_id])[topic_id]
+        ]
 
         return jsonify(attributes)
     except Exception as e:
@@ -1222,22 +1707,24 @@ def add_topic_attributes(topic_id):
         # Support both single attribute and array of attributes
         attributes = data if isinstance(data, list) else [data]
 
-        created_attributes = []
-        for attr_data in attributes:
-            attribute_data = {
+        # Skip attributes without a name; the rest go in one bulk insert
+        new_attributes = [
+            {
                 "name": attr_data.get("name"),
                 "description": attr_data.get("description", ""),
                 "topic_id": topic_id
             }
+            for attr_data in attributes
+            if attr_data.get("name")
+        ]
 
-            if not attribute_data["name"]:
-                continue
-
-            # Create the attribute
-            result = kb.client.table("attributes").insert(attribute_data).execute()
+        created_attributes = []
+        if new_attributes:
+            result = kb.client.table("attributes").insert(new_attributes).execute()
+            created_attributes = result.data or []
 
-            if result.data:
-                created_attributes.append(result.data[0])
+        if created_attributes:
+            invalidate_hierarchy_caches()
 
         return jsonify({
             "success": True,
@@ -1267,6 +1754,7 @@ def update_attribute(attribute_id):
             .update(update_data) \
             .eq("id", attribute_id) \
             .execute()
+        invalidate_hierarchy_caches()
 
         return jsonify(result.data[0] if result.data else {})
     except Exception as e:
@@ -1280,6 +1768,7 @@ def delete_attribute(attribute_id):
             .delete() \
             .eq("id", attribute_id) \
             .execute()
+        invalidate_hierarchy_caches()
 
         return jsonify({"success": True, "message": "Attribute deleted successfully"})
     except Exception as e:
@@ -1295,10 +1784,9 @@ def get_concept_attributes(concept_id):
     """
     try:
         # Try to get the topic_id for this concept
-        concept_result = kb.client.table("concepts").select("topic_id").eq("id", concept_id).execute()
-        if concept_result.data and concept_result.data[0].get("topic_id"):
-            topic_id = concept_result.data[0]["topic_id"]
-            return get_topic_attributes(topic_id)
+        concept = get_concept_by_id(concept_id)
+        if concept and concept.get("topic_id"):
+            return get_topic_attributes(concept["topic_id"])
 
         return jsonify([])
     except Exception as e:
@@ -1359,32 +1847,34 @@ def create_question_with_selected_attributes():
 
         question = question_result.data[0]
         question_id = question["id"]
+        invalidate_hierarchy_caches()
 
         # Create any new attributes that the user specified
         created_attributes = []
         if create_new_attributes and topic_id:
-            for attr in create_new_attributes:
-                attr_data = {
-                    "name": attr.get("name", ""),
+            # Skip attributes without a name; the rest go in one bulk insert
+            new_attributes = [
+                {
+                    "name": attr.get("name"),
                     "description": attr.get("description", ""),
                     "topic_id": topic_id  # Changed from concept_id to topic_id
                 }
+                for attr in create_new_attributes
+                if attr.get("name")
+            ]
 
-                # Validate attribute data
-                if not attr_data["name"]:
-                    continue
+            if new_attributes:
+                attr_result = kb.client.table("attributes").insert(new_attributes).execute()
+                created_attributes = attr_result.data or []
 
-                attr_result = kb.client.table("attributes").insert(attr_data).execute()
+            # Add to selected attributes for Q-matrix creation
+            selected_attributes.extend(
+                {"attribute_id": created_attr["id"], "value": True}
+                for created_attr in created_attributes
+            )
 
-                if attr_result.data:
-                    created_attr = attr_result.data[0]
-                    created_attributes.append(created_attr)
-
-                    # Add to selected attributes for Q-matrix creation
-                    selected_attributes.append({
-                        "attribute_id": created_attr["id"],
-                        "value": True
-                    })
+            if created_attributes:
+                invalidate_hierarchy_caches()
 
         # Create Q-matrix entries for selected attributes
         q_matrix_entries = []
@@ -1397,9 +1887,11 @@ def create_question_with_selected_attributes():
                 }
                 q_matrix_entries.append(q_matrix_entry)
 
-        # Insert Q-matrix entries in batch
+        # Insert Q-matrix entries in batch; reads cached since the question was
+        # created would show all attribute values false, so drop them again
         if q_matrix_entries:
             q_matrix_result = kb.client.table("q_matrix").insert(q_matrix_entries).execute()
+            invalidate_hierarchy_caches()
 
         # Return the created question with attributes and parameters
         response = {
@@ -1412,11 +1904,13 @@ def create_question_with_selected_attributes():
 
         return jsonify(response), 201
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
 # Question Routes (keeping all existing ones)
+QUESTIONS_PAGE_SIZE = 50
+QUESTIONS_MAX_PAGE_SIZE = 200
+
 @app.route('/api/questions', methods=['GET'])
 def api_get_questions():
     """
@@ -1430,73 +1924,28 @@ def api_get_questions():
     topic_id = request.args.get('topic_id')
     concept_id = request.args.get('concept_id')
     
-    # Get questions with filters
+    # Extract pagination parameters
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        page_size = min(max(int(request.args.get('page_size', QUESTIONS_PAGE_SIZE)), 1), QUESTIONS_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "page and page_size must be integers"}), 400
+    
+    # Get one page of questions with filters
     questions = kb.get_questions_by_filters(
         exam_id=exam_id,
         subject_id=subject_id,
         chapter_id=chapter_id,
         topic_id=topic_id,
-        concept_id=concept_id
+        concept_id=concept_id,
+        offset=(page - 1) * page_size,
+        limit=page_size
     )
     
-    # Enhance each question with attributes and q_matrix
-    enhanced_questions = []
-    for question in questions:
-        # Get the topic_id for this question
-        question_topic_id = question.get("topic_id")
-        if not question_topic_id:
-            # If no topic_id, skip attribute and q_matrix processing
-            question["attributes"] = []
-            question["q_matrix"] = []
-            enhanced_questions.append(question)
-            continue
-
-        # Get ALL attributes for this topic
-        topic_attrs_result = kb.client.table("attributes") \
-            .select("id, name, description") \
-            .eq("topic_id", question_topic_id) \
-            .execute()
-        topic_attributes = topic_attrs_result.data
-        
-        # Get Q-matrix entries for this question
-        q_matrix_result = kb.client.table("q_matrix") \
-            .select("attribute_id, value") \
-            .eq("question_id", question["id"]) \
-            .execute()
-        q_matrix_entries = q_matrix_result.data
-        
-        # Create a mapping of attribute_id to value from q_matrix
-        q_matrix_map = {}
-        for entry in q_matrix_entries:
-            q_matrix_map[entry["attribute_id"]] = entry["value"]
-        
-        # Format all topic attributes with value
-        formatted_attributes = []
-        for attr in topic_attributes:
-            # Check if this attribute has a q_matrix entry for this question
-            value = q_matrix_map.get(attr["id"], False)
-
-            attr_with_value = {
-                "id": attr["id"],
-                "name": attr["name"],
-                "description": attr["description"],
-                "value": value
-            }
-            formatted_attributes.append(attr_with_value)
-        
-        # Create q_matrix as array of indices of attributes with value=true
-        q_matrix_indices = []
-        for i, attr in enumerate(formatted_attributes):
-            if attr["value"]:
-                q_matrix_indices.append(i)
-        
-        # Add attributes and q_matrix to question
-        question["attributes"] = formatted_attributes
-        question["q_matrix"] = q_matrix_indices
-        
-        enhanced_questions.append(question)
+    # Add topic attributes and q_matrix to every question in two batched queries
+    enhanced_questions = attach_topic_attributes(questions)
     
-    return jsonify(enhanced_questions)
+    return ojsonify(enhanced_questions)
 
 @app.route('/api/questions/<question_id>', methods=['GET'])
 def api_get_question(question_id):
@@ -1504,64 +1953,50 @@ def api_get_question(question_id):
     Get a specific question by ID, including attributes and q_matrix data.
     The q-matrix is formed based on all attributes under the question's topic.
     """
+    with _question_response_lock:
+        body = _question_response_cache.get(question_id)
+        generation = _question_response_generation
+    if body is not None:
+        return Response(body, mimetype='application/json')
+    
     # Get question by ID
     question = get_question_by_id(question_id)
     
     if not question:
         return jsonify({"error": "Question not found"}), 404
     
-    # Get the topic_id for this question
-    question_topic_id = question.get("topic_id")
-    if not question_topic_id:
-        # If no topic_id, return with empty attributes and q_matrix
-        question["attributes"] = []
-        question["q_matrix"] = []
-        return jsonify(question)
-
-    # Get ALL attributes for this topic
-    topic_attrs_result = kb.client.table("attributes") \
-        .select("id, name, description") \
-        .eq("topic_id", question_topic_id) \
-        .execute()
-    topic_attributes = topic_attrs_result.data
-    
-    # Get Q-matrix entries for this question
-    q_matrix_result = kb.client.table("q_matrix") \
-        .select("attribute_id, value") \
-        .eq("question_id", question_id) \
-        .execute()
-    q_matrix_entries = q_matrix_result.data
-    
-    # Create a mapping of attribute_id to value from q_matrix
-    q_matrix_map = {}
-    for entry in q_matrix_entries:
-        q_matrix_map[entry["attribute_id"]] = entry["value"]
-    
-    # Format all topic attributes with value
-    formatted_attributes = []
-    for attr in topic_attributes:
-        # Check if this attribute has a q_matrix entry for this question
-        value = q_matrix_map.get(attr["id"], False)
-        
-        attr_with_value = {
-            "id": attr["id"],
-            "name": attr["name"],
-            "description": attr["description"],
-            "value": value
-        }
-        formatted_attributes.append(attr_with_value)
-    
-    # Create q_matrix as array of indices of attributes with value=true
-    q_matrix_indices = []
-    for i, attr in enumerate(formatted_attributes):
-        if attr["value"]:
-            q_matrix_indices.append(i)
-    
-    # Add attributes and q_matrix to question
-    question["attributes"] = formatted_attributes
-    question["q_matrix"] = q_matrix_indices
+    try:
+        # The topic attributes joined with this question's q-matrix values come
+        # from one database call (empty when the question has no topic)
+        q_matrix_rows = kb.client.rpc("get_question_qmatrix", {"qid": question_id}).execute().data or []
+    except Exception:
+        # Without the function (migration STEP 7), read the topic attributes
+        # and q_matrix separately
+        attach_topic_attributes([question])
+    else:
+        # Format all topic attributes with value, and the q_matrix as the
+        # indices of attributes with value=true, in one pass
+        formatted_attributes = []
+        q_matrix_indices = []
+        for i, attr in enumerate(q_matrix_rows):
+            formatted_attributes.append({
+                "id": attr["id"],
+                "name": attr["name"],
+                "description": attr["description"],
+                "value": attr["value"]
+            })
+            if attr["value"]:
+                q_matrix_indices.append(i)
+        
+        # Add attributes and q_matrix to question
+        question["attributes"] = formatted_attributes
+        question["q_matrix"] = q_matrix_indices
     
-    return jsonify(question)
+    body = orjson.dumps(question, option=orjson.OPT_NON_STR_KEYS)
+    with _question_response_lock:
+        if generation == _question_response_generation:
+            _question_response_cache[question_id] = body
+    return Response(body, mimetype='application/json')
 
 @app.route('/api/hierarchy/<level>/<item_id>/questions/enhanced', methods=['GET'])
 def api_get_enhanced_questions_by_hierarchy(level, item_id):
@@ -1572,12 +2007,16 @@ def api_get_enhanced_questions_by_hierarchy(level, item_id):
     - Attribute metadata
 
     The response includes a unified attribute list for the entire level,
-    and each question has a binary vector indicating which attributes apply.
+    and each question has a binary vector indicating which attributes apply,
+    both as a 0/1 list ("q_vector") and bit-packed ("q_vector_b64": base64 of
+    bytes where attribute i is bit i % 8 of byte i // 8). Pass
+    ?q_vector=packed to omit the list form.
     """
     try:
         # Extract pagination parameters
         page = int(request.args.get('page', 1))
         page_size = int(request.args.get('page_size', 20))
+        packed_only = request.args.get('q_vector') == 'packed'
 
         # Validate level
         valid_levels = ["exam", "subject", "chapter", "topic", "class"]
@@ -1591,8 +2030,17 @@ def api_get_enhanced_questions_by_hierarchy(level, item_id):
         # Create question filter
         question_filter = QuestionFilter(**filter_params)
 
-        # Search questions
-        result = run_async(item_bank_service.search_questions(question_filter, page, page_size))
+        # Search questions on the query pool while the level's attributes are
+        # fetched here; neither depends on the other
+        search_future = _query_executor.submit(
+            lambda: run_async(item_bank_service.search_questions(question_filter, page, page_size))
+        )
+
+        # Get all attributes for all topics at this level, with their IDs
+        # sorted for lookup
+        all_attributes, order, sorted_ids = get_level_attributes(level, item_id)
+
+        result = search_future.result()
         questions = result["data"]
 
         if not questions:
@@ -1605,75 +2053,55 @@ def api_get_enhanced_questions_by_hierarchy(level, item_id):
                 "pagination": result["pagination"]
             })
 
-        # Collect all unique topic IDs from questions at this level
-        topic_ids = set()
-        for question in questions:
-            if question.get("topic_id"):
-                topic_ids.add(question["topic_id"])
-
-        # Get all attributes for all topics at this level
-        all_attributes = []
-        attribute_id_to_index = {}
-
-        if topic_ids:
-            # Fetch attributes for all topics
-            attrs_result = kb.client.table("attributes") \
-                .select("id, name, description, topic_id") \
-                .in_("topic_id", list(topic_ids)) \
-                .execute()
-
-            all_attributes = attrs_result.data
-
-            # Create a mapping of attribute_id to index
-            for idx, attr in enumerate(all_attributes):
-                attribute_id_to_index[attr["id"]] = idx
-
-        # Process each question
-        enhanced_questions = []
-        for question in questions:
-            # Get Q-matrix entries for this question
-            q_matrix_result = kb.client.table("q_matrix") \
-                .select("attribute_id, value") \
-                .eq("question_id", question["id"]) \
-                .execute()
-
-            q_matrix_entries = q_matrix_result.data
-
-            # Create binary vector for this question
-            # Vector length = total number of attributes at this level
-            q_vector = [0] * len(all_attributes)
-
-            # Fill in the vector based on q_matrix entries
-            for entry in q_matrix_entries:
-                attr_id = entry["attribute_id"]
-                if attr_id in attribute_id_to_index and entry["value"]:
-                    idx = attribute_id_to_index[attr_id]
-                    q_vector[idx] = 1
-
-            # Add enhanced data to question
-            enhanced_question = {
-                **question,
-                "q_vector": q_vector,
-                "attribute_count": sum(q_vector)
-            }
-
-            enhanced_questions.append(enhanced_question)
-
-        # Return enhanced response
-        response = {
-            "level": level,
-            "level_id": item_id,
-            "total_questions": result["pagination"]["total"],
-            "attributes": all_attributes,
-            "attribute_count": len(all_attributes),
-            "questions": enhanced_questions,
-            "pagination": result["pagination"]
-        }
+        # Get the attributes set to true for all questions on the page at once,
+        # as parallel (row, attribute_id) lists
+        true_ids_by_question = get_true_attribute_ids(questions)
+        rows, true_ids = [], []
+        for row, question in enumerate(questions):
+            attr_ids = true_ids_by_question.get(question["id"], ())
+            rows.extend([row] * len(attr_ids))
+            true_ids.extend(attr_ids)
+
+        # Binary vectors for the whole page; vector length = total number of
+        # attributes at this level
+        q_vectors = np.zeros((len(questions), len(all_attributes)), dtype=np.uint8)
+        if all_attributes and true_ids:
+            # Resolve every attribute ID to its column with one binary search
+            # over the sorted IDs, then set them all in one scatter
+            keys = np.array(true_ids, dtype=str)
+            pos = np.searchsorted(sorted_ids, keys).clip(max=len(sorted_ids) - 1)
+            found = sorted_ids[pos] == keys
+            q_vectors[np.array(rows)[found], order[pos[found]]] = 1
+        q_bits = np.packbits(q_vectors, axis=1, bitorder="little")
+        attribute_counts = q_vectors.sum(axis=1).tolist()
+
+        # Build each enhanced question only as it is written to the response
+        def enhanced_questions():
+            for i, question in enumerate(questions):
+                enhanced_question = {
+                    **question,
+                    "q_vector_b64": base64.b64encode(q_bits[i].tobytes()).decode("ascii"),
+                    "attribute_count": attribute_counts[i]
+                }
+                if not packed_only:
+                    enhanced_question["q_vector"] = q_vectors[i]
+                yield enhanced_question
 
-        return jsonify(response)
+        # Stream the enhanced response
+        return ojsonify_stream(
+            {
+                "level": level,
+                "level_id": item_id,
+                "total_questions": result["pagination"]["total"],
+                "attributes": all_attributes,
+                "attribute_count": len(all_attributes)
+            },
+            "questions",
+            enhanced_questions(),
+            {"pagination": result["pagination"]}
+        )
 
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
@@ -1697,62 +2125,11 @@ def api_get_questions_by_hierarchy(level, item_id):
     # Search questions
     result = run_async(item_bank_service.search_questions(question_filter, page, page_size))
     
-    # Enhance each question with attributes and q_matrix
-    questions = result["data"]
-    for question in questions:
-        # Get the topic_id for this question
-        question_topic_id = question.get("topic_id")
-        if not question_topic_id:
-            # If no topic_id, skip attribute and q_matrix processing
-            question["attributes"] = []
-            question["q_matrix"] = []
-            continue
-
-        # Get ALL attributes for this topic
-        topic_attrs_result = kb.client.table("attributes") \
-            .select("id, name, description") \
-            .eq("topic_id", question_topic_id) \
-            .execute()
-        topic_attributes = topic_attrs_result.data
-        
-        # Get Q-matrix entries for this question
-        q_matrix_result = kb.client.table("q_matrix") \
-            .select("attribute_id, value") \
-            .eq("question_id", question["id"]) \
-            .execute()
-        q_matrix_entries = q_matrix_result.data
-        
-        # Create a mapping of attribute_id to value from q_matrix
-        q_matrix_map = {}
-        for entry in q_matrix_entries:
-            q_matrix_map[entry["attribute_id"]] = entry["value"]
-        
-        # Format all topic attributes with value
-        formatted_attributes = []
-        for attr in topic_attributes:
-            # Check if this attribute has a q_matrix entry for this question
-            value = q_matrix_map.get(attr["id"], False)
-
-            attr_with_value = {
-                "id": attr["id"],
-                "name": attr["name"],
-                "description": attr["description"],
-                "value": value
-            }
-            formatted_attributes.append(attr_with_value)
-        
-        # Create q_matrix as array of indices of attributes with value=true
-        q_matrix_indices = []
-        for i, attr in enumerate(formatted_attributes):
-            if attr["value"]:
-                q_matrix_indices.append(i)
-        
-        # Add attributes and q_matrix to question
-        question["attributes"] = formatted_attributes
-        question["q_matrix"] = q_matrix_indices
+    # Add topic attributes and q_matrix to every question in two batched queries
+    attach_topic_attributes(result["data"])
     
-    # Return the enhanced result
-    return jsonify(result)
+    # Stream the enhanced result
+    return ojsonify_stream({}, "data", result["data"], {"pagination": result["pagination"]})
 
 # Add a new endpoint to get a batch of questions by IDs
 @app.route('/api/questions/batch-get', methods=['POST'])
@@ -1774,147 +2151,46 @@ def api_get_questions_batch():
         .execute()
     questions = result.data
     
-    # Create a map of topic_id to attributes for batch processing
-    topic_attributes_map = {}
-
-    # Collect all distinct topic IDs
-    topic_ids = set()
-    for question in questions:
-        if question.get("topic_id"):
-            topic_ids.add(question["topic_id"])
-
-    # Batch fetch attributes for all topics
-    if topic_ids:
-        for topic_id in topic_ids:
-            attrs_result = kb.client.table("attributes") \
-                .select("id, name, description") \
-                .eq("topic_id", topic_id) \
-                .execute()
-            topic_attributes_map[topic_id] = attrs_result.data
-    
-    # Create a map of question_id to q_matrix entries for batch processing
-    q_matrix_map = {}
-    if questions:
-        for question_id in question_ids:
-            q_matrix_result = kb.client.table("q_matrix") \
-                .select("attribute_id, value") \
-                .eq("question_id", question_id) \
-                .execute()
-            
-            # Convert to a map of attribute_id -> value for easier lookup
-            attr_value_map = {}
-            for entry in q_matrix_result.data:
-                attr_value_map[entry["attribute_id"]] = entry["value"]
-            
-            q_matrix_map[question_id] = attr_value_map
+    # Add topic attributes and q_matrix to every question in two batched queries
+    attach_topic_attributes(questions)
     
-    # Enhance each question with attributes and q_matrix
-    for question in questions:
-        topic_id = question.get("topic_id")
-        if not topic_id or topic_id not in topic_attributes_map:
-            question["attributes"] = []
-            question["q_matrix"] = []
-            continue
-
-        # Get the attributes for this topic
-        topic_attributes = topic_attributes_map[topic_id]
-        
-        # Get the q_matrix entries for this question
-        question_q_matrix = q_matrix_map.get(question["id"], {})
-
-        # Format all topic attributes with value
-        formatted_attributes = []
-        for attr in topic_attributes:
-            # Check if this attribute has a q_matrix entry for this question
-            value = question_q_matrix.get(attr["id"], False)
-            
-            attr_with_value = {
-                "id": attr["id"],
-                "name": attr["name"],
-                "description": attr["description"],
-                "value": value
-            }
-            formatted_attributes.append(attr_with_value)
-        
-        # Create q_matrix as array of indices of attributes with value=true
-        q_matrix_indices = []
-        for i, attr in enumerate(formatted_attributes):
-            if attr["value"]:
-                q_matrix_indices.append(i)
-        
-        # Add attributes and q_matrix to question
-        question["attributes"] = formatted_attributes
-        question["q_matrix"] = q_matrix_indices
-    
-    return jsonify({"questions": questions})
+    return ojsonify({"questions": questions})
 
 @app.route('/api/hierarchy/<level>/<item_id>/children', methods=['GET'])
 def api_get_hierarchy_children(level, item_id):
     # Get children at this level
     children = kb.get_children(level, item_id)
-    return jsonify(children)
+    return ojsonify(children)
 
 @app.route('/api/hierarchy/<level>/<item_id>/chain', methods=['GET'])
 def api_get_hierarchy_chain(level, item_id):
     # Get full hierarchy chain
     chain = kb.get_hierarchy_chain(level, item_id)
-    return jsonify(chain)
+    return ojsonify(chain)
 
 # Getting the full hierarchy tree - useful for UI navigation
 @app.route('/api/hierarchy/tree', methods=['GET'])
+@cached_get
 def api_get_hierarchy_tree():
     """
     Get the entire hierarchy tree as a nested JSON object.
     Supports both competitive and school exam paths.
     This is useful for UI navigation and visualization.
     """
-    # Get all exams
-    result = kb.client.table("exams").select("*").execute()
-    exams = result.data
-    tree = []
-
-    for exam in exams:
-        exam_type = exam.get("exam_type", "competitive")
-        exam_node = {
-            "id": exam["id"],
-            "name": exam["name"],
-            "description": exam["description"],
-            "exam_type": exam_type,
-            "type": "exam",
-            "children": []
-        }
-
-        if exam_type == "school":
-            # School path: Exam → Class → Subject → Chapter → Topic
-            classes = kb.get_classes_by_exam(exam["id"])
-            for class_obj in classes:
-                class_node = {
-                    "id": class_obj["id"],
-                    "name": class_obj["name"],
-                    "description": class_obj.get("description"),
-                    "class_number": class_obj.get("class_number"),
-                    "type": "class",
-                    "children": []
-                }
+    return ojsonify(get_hierarchy_tree())
 
-                # Get subjects for this class
-                subjects = kb.get_subjects_by_class(class_obj["id"])
-                for subject in subjects:
-                    subject_node = build_subject_tree_node(subject)
-                    class_node["children"].append(subject_node)
-
-                exam_node["children"].append(class_node)
-
-        else:
-            # Competitive path: Exam → Subject → Chapter → Topic
-            subjects = kb.get_subjects_by_exam(exam["id"])
-            for subject in subjects:
-                subject_node = build_subject_tree_node(subject)
-                exam_node["children"].append(subject_node)
-
-        tree.append(exam_node)
+@app.route('/api/hierarchy/tree/<exam_id>', methods=['GET'])
+@cached_get
+def api_get_exam_hierarchy_tree(exam_id):
+    """Get the hierarchy tree of a single exam as a nested JSON object."""
+    try:
+        tree = get_hierarchy_tree([exam_id])
+        if not tree:
+            return jsonify({"error": "Exam not found"}), 404
 
-    return jsonify(tree)
+        return ojsonify(tree[0])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 # Add an endpoint to ensure a hierarchical element exists
 @app.route('/api/hierarchy/ensure', methods=['POST'])
@@ -1932,34 +2208,21 @@ def api_ensure_hierarchy():
     if not level or not name or not parent_id:
         return jsonify({"error": "Level, name, and parent_id are required"}), 400
     
-    # Check if the element already exists
-    if level == 'subject':
-        elements = get_subjects(parent_id)
-    elif level == 'chapter':
-        elements = get_chapters(parent_id)
-    elif level == 'topic':
-        elements = get_topics(parent_id)
-    elif level == 'concept':
-        elements = get_concepts(parent_id)
-    else:
+    if level not in ('subject', 'chapter', 'topic', 'concept'):
         return jsonify({"error": "Invalid level"}), 400
     
-    # Check if the element already exists
-    for element in elements:
-        if element['name'].lower() == name.lower():
-            return jsonify({"exists": True, "element": element})
+    # Get the element with this name (case-insensitive) under the parent, or
+    # create it, in one atomic call
+    result = kb.client.rpc("ensure_hierarchy_element", {
+        "level": level,
+        "parent_id": parent_id,
+        "element_name": name,
+        "element_description": description
+    }).execute().data[0]
     
-    # Element doesn't exist, create it
-    if level == 'subject':
-        element = kb.add_subject(parent_id, name, description)
-    elif level == 'chapter':
-        element = kb.add_chapter(parent_id, name, description)
-    elif level == 'topic':
-        element = kb.add_topic(parent_id, name, description)
-    elif level == 'concept':
-        element = kb.add_concept(parent_id, name, description)
-    
-    return jsonify({"exists": False, "element": element})
+    if result["inserted"]:
+        invalidate_hierarchy_caches()
+    return ojsonify({"exists": not result["inserted"], "element": result["element"]})
 
 @app.route('/api/questions/batch', methods=['POST'])
 def batch_create_questions():
@@ -1972,74 +2235,109 @@ def batch_create_questions():
             return jsonify({"error": "Invalid batch data format"}), 400
             
         questions = batch_data["questions"]
-        created_questions = []
-        all_q_matrix_entries = []
-        
-        # Process each question
-        for question_data in questions:
-            # Extract attributes if present
-            attributes = question_data.pop("attributes", []) if question_data else []
-            
-            # Create the question
-            result = kb.client.table("questions").insert(question_data).execute()
-            
-            if not result.data:
+        if not isinstance(questions, list):
+            return jsonify({"error": "questions must be an array"}), 400
+        
+        # Validate each question and separate its attributes; invalid entries
+        # are reported by index and the rest of the batch still goes through
+        errors = []
+        valid_questions = []
+        for index, question_data in enumerate(questions):
+            if not isinstance(question_data, dict) or not question_data:
+                errors.append({"index": index, "error": "Question must be a non-empty object"})
                 continue
-                
-            question = result.data[0]
+            question_data = dict(question_data)
+            attributes = question_data.pop("attributes", None) or []
+            if not isinstance(attributes, list) or not all(isinstance(attr, dict) for attr in attributes):
+                errors.append({"index": index, "error": "attributes must be an array of objects"})
+                continue
+            valid_questions.append((index, question_data, attributes))
+        
+        # PostgREST requires every object of a bulk insert to have the same
+        # keys, so questions are inserted with one request per key set
+        questions_by_keys = defaultdict(list)
+        for entry in valid_questions:
+            questions_by_keys[frozenset(entry[1])].append(entry)
+        
+        created = []
+        for group in questions_by_keys.values():
+            try:
+                rows = kb.client.table("questions").insert([entry[1] for entry in group]).execute().data or []
+                created.extend(zip(group, rows))
+            except Exception:
+                # Retry the group one question at a time to find the failing ones
+                for entry in group:
+                    try:
+                        rows = kb.client.table("questions").insert(entry[1]).execute().data
+                    except Exception as e:
+                        errors.append({"index": entry[0], "error": str(e)})
+                        continue
+                    if rows:
+                        created.append((entry, rows[0]))
+        
+        # Keep the created questions in request order
+        created.sort(key=lambda item: item[0][0])
+        errors.sort(key=lambda error: error["index"])
+        created_questions = [question for _, question in created]
+        
+        # Attributes of every topic needing auto-generated Q-matrix entries, at once
+        auto_topic_ids = {
+            question_data["topic_id"]
+            for (_, question_data, attributes), _ in created
+            if not attributes and question_data.get("topic_id")
+        }
+        attributes_by_topic = get_attributes_by_topic(auto_topic_ids) if auto_topic_ids else {}
+        
+        # Build the Q-matrix entries of all created questions
+        all_q_matrix_entries = []
+        for (_, question_data, attributes), question in created:
             question_id = question["id"]
-            created_questions.append(question)
             
             # Create Q-matrix entries if attributes were provided
-            q_matrix_entries = []
             if attributes:
                 for attr in attributes:
                     if "attribute_id" in attr and "value" in attr:
-                        q_matrix_entry = {
+                        all_q_matrix_entries.append({
                             "question_id": question_id,
                             "attribute_id": attr["attribute_id"],
                             "value": attr["value"]
-                        }
-                        q_matrix_entries.append(q_matrix_entry)
+                        })
             
             # If no attributes were explicitly provided but a topic_id was,
             # auto-generate the Q-matrix entries using default values
-            elif "topic_id" in question_data and question_data["topic_id"]:
-                topic_id = question_data["topic_id"]
-
-                # Get attributes for this topic
-                attr_result = kb.client.table("attributes") \
-                    .select("id") \
-                    .eq("topic_id", topic_id) \
-                    .execute()
-
-                topic_attributes = attr_result.data
-
-                if topic_attributes:
-                    for attr in topic_attributes:
-                        q_matrix_entry = {
-                            "question_id": question_id,
-                            "attribute_id": attr["id"],
-                            "value": True  # Default to True for auto-generated entries
-                        }
-                        q_matrix_entries.append(q_matrix_entry)
-            
-            # Add these entries to our collection
-            all_q_matrix_entries.extend(q_matrix_entries)
+            elif question_data.get("topic_id"):
+                for attr in attributes_by_topic.get(question_data["topic_id"], ()):
+                    all_q_matrix_entries.append({
+                        "question_id": question_id,
+                        "attribute_id": attr["id"],
+                        "value": True  # Default to True for auto-generated entries
+                    })
         
-        # Insert all Q-matrix entries in a single batch if there are any
-        if all_q_matrix_entries:
-            q_matrix_result = kb.client.table("q_matrix").insert(all_q_matrix_entries).execute()
+        # Insert all Q-matrix entries in bounded batches if there are any; on a
+        # failure, report the questions whose entries were not all written
+        q_matrix_written, q_matrix_error = _insert_chunked("q_matrix", all_q_matrix_entries)
+        if q_matrix_error is not None:
+            traceback.print_exception(type(q_matrix_error), q_matrix_error, q_matrix_error.__traceback__)
+            incomplete_ids = {entry["question_id"] for entry in all_q_matrix_entries[q_matrix_written:]}
+            errors.extend(
+                {"index": index, "error": f"Question created but its Q-matrix was not fully written: {q_matrix_error}"}
+                for (index, _, _), question in created
+                if question["id"] in incomplete_ids
+            )
+            errors.sort(key=lambda error: error["index"])
+
+        if created_questions:
+            invalidate_hierarchy_caches()
         
         # Return the created questions with Q-matrix entries
         response = {
             "questions": created_questions,
-            "q_matrix_entries_count": len(all_q_matrix_entries)
+            "q_matrix_entries_count": q_matrix_written,
+            "errors": errors
         }
         
-        return jsonify(response), 201
+        return ojsonify(response, 201 if created_questions or not errors else 400)
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
@@ -2417,6 +2715,9 @@ def upload_question_image(question_id):
         kb.client.table("questions").update({
             "question_image_url": result['url']
         }).eq("id", question_id).execute()
+        item_bank_service.invalidate_cache()
+        pyq_retriever_service.invalidate_question_cache(question_id)
+        invalidate_question_response_cache(question_id)
 
         return jsonify(result), 200
     except Exception as e:
@@ -2440,20 +2741,19 @@ def upload_option_image(question_id, option_key):
         if image_file.filename == '':
             return jsonify({"error": "No file selected"}), 400
 
-        # Upload image
-        result = image_upload_service.upload_option_image(
+        # Start the upload and fetch the current option_images while it is in flight
+        upload = image_upload_service.submit_option_image_upload(
             question_id=question_id,
             option_key=option_key,
             image_file=image_file.read(),
             file_name=image_file.filename
         )
+        question = kb.client.table("questions").select("option_images").eq("id", question_id).execute()
+        result = upload.result()
 
         if not result['success']:
             return jsonify(result), 400
 
-        # Get current option_images
-        question = kb.client.table("questions").select("option_images").eq("id", question_id).execute()
-
         if question.data:
             option_images = question.data[0].get('option_images', {})
             option_images[option_key] = result['url']
@@ -2462,6 +2762,9 @@ def upload_option_image(question_id, option_key):
             kb.client.table("questions").update({
                 "option_images": option_images
             }).eq("id", question_id).execute()
+            item_bank_service.invalidate_cache()
+            pyq_retriever_service.invalidate_question_cache(question_id)
+            invalidate_question_response_cache(question_id)
 
         return jsonify(result), 200
     except Exception as e:
@@ -2509,6 +2812,9 @@ def upload_multiple_option_images(question_id):
             kb.client.table("questions").update({
                 "option_images": option_image_urls
             }).eq("id", question_id).execute()
+            item_bank_service.invalidate_cache()
+            pyq_retriever_service.invalidate_question_cache(question_id)
+            invalidate_question_response_cache(question_id)
 
         return jsonify(result), 200
     except Exception as e:
@@ -2530,6 +2836,9 @@ def delete_question_images(question_id):
                 "question_image_url": None,
                 "option_images": {}
             }).eq("id", question_id).execute()
+            item_bank_service.invalidate_cache()
+            pyq_retriever_service.invalidate_question_cache(question_id)
+            invalidate_question_response_cache(question_id)
 
         return jsonify(result), 200
     except Exception as e:
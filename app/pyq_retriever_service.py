@@ -4,11 +4,27 @@ Handles sequential retrieval of PYQ questions with session management
 """
 import os
 import json
+import threading
+import orjson
+import msgspec
 from typing import Dict, List, Any, Optional, Union, Tuple
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
 import uuid
 from enum import Enum
+from cachetools import TTLCache
+
+# Question payloads (question row plus PYQ metadata) are cached serialized so
+# back-and-forth navigation within a session skips Supabase
+QUESTION_CACHE_MAXSIZE = 4096
+QUESTION_CACHE_TTL = 600  # seconds
+
+# pyq_sessions rows are cached write-through: reads (current, navigate, jump,
+# progress) skip the session SELECT, and every update made here is applied to
+# the cached row once Supabase accepts it. This assumes one API process owns
+# the sessions, as in the single-worker deployment.
+SESSION_CACHE_MAXSIZE = 4096
+SESSION_CACHE_TTL = 1800  # seconds
 
 class SessionStatus(str, Enum):
     ACTIVE = "active"
@@ -23,8 +39,8 @@ class QuestionStatus(str, Enum):
     INCORRECT = "incorrect"
     SKIPPED = "skipped"
 
-class PYQSessionFilter(BaseModel):
-    """Filter model for PYQ sessions."""
+class PYQSessionFilter(msgspec.Struct):
+    """Filter model for PYQ sessions; build with msgspec.convert(data, PYQSessionFilter, strict=False)."""
     exam_id: Optional[str] = None
     subject_id: Optional[str] = None
     chapter_id: Optional[str] = None
@@ -42,6 +58,12 @@ class PYQSessionFilter(BaseModel):
     shuffle_questions: bool = False
     include_solved: bool = True
 
+class SubmitAnswerRequest(msgspec.Struct):
+    """Body of a submit-answer request; decode with msgspec.json.decode(body, type=SubmitAnswerRequest, strict=False)."""
+    question_id: str
+    user_answer: Union[str, bool, int, float]  # normalised with str() by the submit endpoint
+    time_taken: float = 0  # in seconds
+
 class PYQSession(BaseModel):
     """PYQ practice session model."""
     id: str
@@ -60,6 +82,9 @@ class PYQSession(BaseModel):
     status: SessionStatus = SessionStatus.ACTIVE
     question_ids: List[str] = Field(default_factory=list)
     time_limit: Optional[int] = None  # in minutes
+
+    class Config:
+        arbitrary_types_allowed = True  # PYQSessionFilter is a msgspec Struct
     
 class PYQResponse(BaseModel):
     """User response to a PYQ question."""
@@ -82,6 +107,10 @@ class PYQRetrieverService:
         self.supabase = supabase_client
         self.fallback_provider = fallback_provider
         self.fallback_sessions: Dict[str, Dict[str, Any]] = {}
+        self._question_cache = TTLCache(maxsize=QUESTION_CACHE_MAXSIZE, ttl=QUESTION_CACHE_TTL)
+        self._question_cache_lock = threading.Lock()
+        self._session_cache = TTLCache(maxsize=SESSION_CACHE_MAXSIZE, ttl=SESSION_CACHE_TTL)
+        self._session_cache_lock = threading.Lock()
 
     async def create_session(self,
                            user_id: str,
@@ -105,7 +134,7 @@ class PYQRetrieverService:
             session_data = {
                 "user_id": user_id,
                 "session_name": session_name,
-                "filters": filters.dict(),
+                "filters": msgspec.structs.asdict(filters),
                 "current_question_index": 0,
                 "total_questions": len(questions),
                 "questions_answered": 0,
@@ -122,6 +151,8 @@ class PYQRetrieverService:
                     if session_result.data:
                         session = session_result.data[0]
                         session_id = session["id"]
+                        with self._session_cache_lock:
+                            self._session_cache[session_id] = session
 
                         # Store question IDs in fallback for this session
                         # Since session_questions table doesn't exist, use fallback storage
@@ -174,22 +205,7 @@ class PYQRetrieverService:
 
     async def get_current_question(self, session_id: str) -> Dict[str, Any]:
         """Get the current question for a session."""
-        session = None
-        source = "supabase"
-
-        if self.supabase:
-            try:
-                session_result = self.supabase.table("pyq_sessions")                     .select("*")                     .eq("id", session_id)                     .execute()
-
-                if session_result.data:
-                    session = session_result.data[0]
-            except Exception as error:
-                print(f"Supabase get_current_question failed: {error}")
-                session = None
-
-        if session is None:
-            session = self.fallback_sessions.get(session_id)
-            source = "fallback"
+        session, source = self._get_session(session_id)
 
         if not session:
             return {
@@ -241,7 +257,7 @@ class PYQRetrieverService:
 
         if source == "supabase":
             try:
-                self.supabase.table("pyq_sessions")                     .update({"last_activity": datetime.now().isoformat()})                     .eq("id", session_id)                     .execute()
+                self._update_session(session_id, {"last_activity": datetime.now().isoformat()})
             except Exception as error:
                 print(f"Supabase last_activity update failed: {error}")
         else:
@@ -340,26 +356,7 @@ class PYQRetrieverService:
 
     async def navigate_to_question(self, session_id: str, direction: str) -> Dict[str, Any]:
         """Navigate to the next or previous question within a session."""
-        session = None
-        source = "supabase"
-
-        if self.supabase:
-            try:
-                session_result = (
-                    self.supabase.table("pyq_sessions")
-                    .select("*")
-                    .eq("id", session_id)
-                    .execute()
-                )
-                if session_result.data:
-                    session = session_result.data[0]
-            except Exception as error:
-                print(f"Supabase navigate_to_question failed: {error}")
-                session = None
-
-        if session is None:
-            session = self.fallback_sessions.get(session_id)
-            source = "fallback"
+        session, source = self._get_session(session_id)
 
         if not session:
             return {"success": False, "error": "Session not found"}
@@ -387,15 +384,10 @@ class PYQRetrieverService:
 
         if source == "supabase":
             try:
-                (
-                    self.supabase.table("pyq_sessions")
-                    .update({
-                        "current_question_index": current_index,
-                        "last_activity": datetime.now().isoformat(),
-                    })
-                    .eq("id", session_id)
-                    .execute()
-                )
+                self._update_session(session_id, {
+                    "current_question_index": current_index,
+                    "last_activity": datetime.now().isoformat(),
+                })
             except Exception as error:
                 print(f"Supabase navigate_to_question update failed: {error}")
         else:
@@ -410,26 +402,7 @@ class PYQRetrieverService:
 
     async def jump_to_question(self, session_id: str, question_index: int) -> Dict[str, Any]:
         """Jump to an absolute question index within a session."""
-        session = None
-        source = "supabase"
-
-        if self.supabase:
-            try:
-                session_result = (
-                    self.supabase.table("pyq_sessions")
-                    .select("*")
-                    .eq("id", session_id)
-                    .execute()
-                )
-                if session_result.data:
-                    session = session_result.data[0]
-            except Exception as error:
-                print(f"Supabase jump_to_question failed: {error}")
-                session = None
-
-        if session is None:
-            session = self.fallback_sessions.get(session_id)
-            source = "fallback"
+        session, source = self._get_session(session_id)
 
         if not session:
             return {"success": False, "error": "Session not found"}
@@ -447,15 +420,10 @@ class PYQRetrieverService:
 
         if source == "supabase":
             try:
-                (
-                    self.supabase.table("pyq_sessions")
-                    .update({
-                        "current_question_index": question_index,
-                        "last_activity": datetime.now().isoformat(),
-                    })
-                    .eq("id", session_id)
-                    .execute()
-                )
+                self._update_session(session_id, {
+                    "current_question_index": question_index,
+                    "last_activity": datetime.now().isoformat(),
+                })
             except Exception as error:
                 print(f"Supabase jump_to_question update failed: {error}")
         else:
@@ -471,26 +439,7 @@ class PYQRetrieverService:
     async def get_session_progress(self, session_id: str) -> Dict[str, Any]:
         """Return progress metrics for a session."""
         try:
-            session = None
-            source = "supabase"
-
-            if self.supabase:
-                try:
-                    session_result = (
-                        self.supabase.table("pyq_sessions")
-                        .select("*")
-                        .eq("id", session_id)
-                        .execute()
-                    )
-                    if session_result.data:
-                        session = session_result.data[0]
-                except Exception as error:
-                    print(f"Supabase get_session_progress failed: {error}")
-                    session = None
-
-            if session is None:
-                session = self.fallback_sessions.get(session_id)
-                source = "fallback"
+            session, source = self._get_session(session_id)
 
             if not session:
                 return {"success": False, "error": "Session not found"}
@@ -635,17 +584,14 @@ class PYQRetrieverService:
     async def pause_session(self, session_id: str) -> Dict[str, Any]:
         """Pause a session."""
         if self.supabase:
+            # Repeated clicks on an already-paused session skip the write
+            if self._session_cached_as(session_id, {"is_active": False}):
+                return {"success": True, "message": "Session paused"}
             try:
-                # Try direct update with from_("pyq_sessions")
-                result = (
-                    self.supabase.from_("pyq_sessions")
-                    .update({
-                        "is_active": False,
-                        "last_activity": datetime.now().isoformat(),
-                    })
-                    .eq("id", session_id)
-                    .execute()
-                )
+                self._update_session(session_id, {
+                    "is_active": False,
+                    "last_activity": datetime.now().isoformat(),
+                })
                 return {"success": True, "message": "Session paused"}
             except Exception as error:
                 print(f"Supabase pause_session failed: {error}")
@@ -662,17 +608,14 @@ class PYQRetrieverService:
     async def resume_session(self, session_id: str) -> Dict[str, Any]:
         """Resume a paused session."""
         if self.supabase:
+            # Repeated clicks on an already-resumed session skip the write
+            if self._session_cached_as(session_id, {"is_active": True}):
+                return {"success": True, "message": "Session resumed"}
             try:
-                # Try direct update with from_("pyq_sessions")
-                result = (
-                    self.supabase.from_("pyq_sessions")
-                    .update({
-                        "is_active": True,
-                        "last_activity": datetime.now().isoformat(),
-                    })
-                    .eq("id", session_id)
-                    .execute()
-                )
+                self._update_session(session_id, {
+                    "is_active": True,
+                    "last_activity": datetime.now().isoformat(),
+                })
                 return {"success": True, "message": "Session resumed"}
             except Exception as error:
                 print(f"Supabase resume_session failed: {error}")
@@ -711,6 +654,49 @@ class PYQRetrieverService:
             print(f"Error calculating session duration: {e}")
             return 0
 
+    def _get_session(self, session_id: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Look up a session row, from the session cache when possible.
+
+        Returns:
+            (session, source) where source is "supabase" or "fallback"
+        """
+        if self.supabase:
+            with self._session_cache_lock:
+                session = self._session_cache.get(session_id)
+            if session is None:
+                try:
+                    session_result = (
+                        self.supabase.table("pyq_sessions")
+                        .select("*")
+                        .eq("id", session_id)
+                        .execute()
+                    )
+                    if session_result.data:
+                        session = session_result.data[0]
+                        with self._session_cache_lock:
+                            self._session_cache[session_id] = session
+                except Exception as error:
+                    print(f"Supabase session lookup failed: {error}")
+            if session is not None:
+                return session, "supabase"
+
+        return self.fallback_sessions.get(session_id), "fallback"
+
+    def _session_cached_as(self, session_id: str, fields: Dict[str, Any]) -> bool:
+        """Whether the cached session row already holds all of these values."""
+        with self._session_cache_lock:
+            session = self._session_cache.get(session_id)
+        return session is not None and all(session.get(k) == v for k, v in fields.items())
+
+    def _update_session(self, session_id: str, fields: Dict[str, Any]):
+        """Update a pyq_sessions row and, once that succeeds, its cached copy."""
+        self.supabase.table("pyq_sessions").update(fields).eq("id", session_id).execute()
+        with self._session_cache_lock:
+            session = self._session_cache.get(session_id)
+            if session is not None:
+                self._session_cache[session_id] = {**session, **fields}
+
     async def _update_session_stats(self, session_id: str):
         """Update session statistics."""
         # Get stats from fallback storage
@@ -724,15 +710,10 @@ class PYQRetrieverService:
         # Update Supabase session stats
         if self.supabase:
             try:
-                (
-                    self.supabase.table("pyq_sessions")
-                    .update({
-                        "questions_answered": questions_answered,
-                        "last_activity": datetime.now().isoformat(),
-                    })
-                    .eq("id", session_id)
-                    .execute()
-                )
+                self._update_session(session_id, {
+                    "questions_answered": questions_answered,
+                    "last_activity": datetime.now().isoformat(),
+                })
             except Exception as error:
                 print(f"Supabase _update_session_stats failed: {error}")
 
@@ -815,8 +796,21 @@ class PYQRetrieverService:
 
         return question_ids
 
+    def invalidate_question_cache(self, question_id: Optional[str] = None):
+        """Drop one cached question payload, or all of them when no ID is given."""
+        with self._question_cache_lock:
+            if question_id is None:
+                self._question_cache.clear()
+            else:
+                self._question_cache.pop(question_id, None)
+
     async def _get_question_with_metadata(self, question_id: str) -> Optional[Dict[str, Any]]:
-        """Get a question with its PYQ metadata."""
+        """Get a question with its PYQ metadata, served from the question cache when possible."""
+        with self._question_cache_lock:
+            blob = self._question_cache.get(question_id)
+        if blob is not None:
+            return orjson.loads(blob)
+
         question = None
 
         if self.supabase:
@@ -848,4 +842,9 @@ class PYQRetrieverService:
             except Exception as error:
                 print(f"Supabase _get_question_with_metadata failed: {error}")
 
+        if question is not None:
+            blob = orjson.dumps(question)
+            with self._question_cache_lock:
+                self._question_cache[question_id] = blob
+
         return question
@@ -5,13 +5,17 @@ Handles uploading of previous year questions with comprehensive metadata
 import os
 import json
 import pandas as pd
-from typing import Dict, List, Any, Optional, Union, Tuple
+from typing import BinaryIO, Dict, List, Any, Optional, Union, Tuple
 from datetime import datetime
 from pydantic import BaseModel, Field, validator
 import uuid
 from dataclasses import dataclass
 import asyncio
 
+# Seconds between status checks while waiting on an LLM Batch API job
+BATCH_POLL_INTERVAL = 60
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
 class PYQMetadata(BaseModel):
     """Metadata model for PYQ questions."""
     year: int = Field(..., ge=1990, le=2030, description="Year of the question paper")
@@ -118,12 +122,14 @@ class PYQUploadService:
         
         print("PYQ tables schema defined (implement via migrations)")
 
-    async def upload_single_pyq(self, pyq_question: PYQQuestion) -> Dict[str, Any]:
+    async def upload_single_pyq(self, pyq_question: PYQQuestion,
+                                parameters: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
         """
         Upload a single PYQ question with metadata.
 
         Args:
             pyq_question: PYQ question with metadata
+            parameters: Precomputed 3PL parameters (generated via the LLM service if omitted)
 
         Returns:
             Dictionary with upload result
@@ -141,7 +147,7 @@ class PYQUploadService:
         }
 
         # Generate 3PL parameters if LLM service is available
-        if self.llm_service and pyq_question.exam_id and pyq_question.subject_id:
+        if parameters is None and self.llm_service and pyq_question.exam_id and pyq_question.subject_id:
             exam_name = await self._get_name_by_id("exams", pyq_question.exam_id)
             subject_name = await self._get_name_by_id("subjects", pyq_question.subject_id)
 
@@ -153,6 +159,7 @@ class PYQUploadService:
                 subject_name
             )
 
+        if parameters is not None:
             question_data.update({
                 "difficulty": parameters.get("difficulty", 0.5),
                 "discrimination": parameters.get("discrimination", 1.0),
@@ -263,12 +270,14 @@ class PYQUploadService:
                 "message": "Stored PYQ question in in-memory fallback storage because Supabase operation failed."
             }
 
-    async def upload_bulk_pyq(self, pyq_questions: List[PYQQuestion]) -> Dict[str, Any]:
+    async def upload_bulk_pyq(self, pyq_questions: List[PYQQuestion],
+                              generated_parameters: Optional[List[Any]] = None) -> Dict[str, Any]:
         """
         Upload multiple PYQ questions in bulk.
         
         Args:
             pyq_questions: List of PYQ questions
+            generated_parameters: Precomputed per-question 3PL parameters (see _generate_parameters_many)
             
         Returns:
             Dictionary with bulk upload results
@@ -281,9 +290,16 @@ class PYQUploadService:
             "errors": []
         }
         
+        # Fan the LLM calls out up front instead of one per loop iteration
+        if generated_parameters is None:
+            generated_parameters = await self._generate_parameters_many(pyq_questions)
+
         for i, pyq_question in enumerate(pyq_questions):
             try:
-                result = await self.upload_single_pyq(pyq_question)
+                parameters = generated_parameters[i]
+                if isinstance(parameters, Exception):
+                    raise parameters
+                result = await self.upload_single_pyq(pyq_question, parameters=parameters)
                 results["results"].append(result)
                 
                 if result["success"]:
@@ -314,12 +330,26 @@ class PYQUploadService:
             file_path: Path to Excel file
             mapping_config: Column mapping configuration
             
+        Returns:
+            Upload results
+        """
+        return await self.upload_from_excel_stream(file_path, mapping_config)
+
+    async def upload_from_excel_stream(self, stream: Union[BinaryIO, str],
+                                       mapping_config: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Upload PYQ questions from an in-memory Excel file.
+        
+        Args:
+            stream: Binary file-like object with the workbook (e.g. BytesIO); a path also works
+            mapping_config: Column mapping configuration
+            
         Returns:
             Upload results
         """
         try:
             # Read Excel file
-            df = pd.read_excel(file_path)
+            df = pd.read_excel(stream)
             
             # Validate required columns
             required_fields = ['content', 'correct_answer']
@@ -385,6 +415,96 @@ class PYQUploadService:
                 "error": f"Failed to process Excel file: {str(e)}"
             }
 
+    async def upload_bulk_pyq_batch(self, pyq_questions: List[PYQQuestion],
+                                    poll_interval: int = BATCH_POLL_INTERVAL,
+                                    on_poll=None) -> Dict[str, Any]:
+        """
+        Upload multiple PYQ questions, estimating 3PL parameters through the LLM Batch API.
+        Waits (up to the batch completion window) for the batch before inserting anything.
+
+        Args:
+            pyq_questions: List of PYQ questions
+            poll_interval: Seconds between batch status checks
+            on_poll: Optional callback receiving the batch object after each check
+
+        Returns:
+            Dictionary with bulk upload results plus the batch ID
+        """
+        generated: List[Any] = [None] * len(pyq_questions)
+        positions, items = await self._build_3pl_items(pyq_questions)
+
+        batch_id = None
+        if items:
+            batch_id = self.llm_service.submit_3pl_batch([
+                {**item, "custom_id": str(i)} for i, item in zip(positions, items)
+            ])
+
+            while True:
+                batch = self.llm_service.poll_batch(batch_id)
+                if on_poll:
+                    on_poll(batch)
+                if batch["status"] in BATCH_TERMINAL_STATUSES:
+                    break
+                await asyncio.sleep(poll_interval)
+
+            if batch["status"] != "completed":
+                raise Exception(f"LLM batch {batch_id} ended with status '{batch['status']}'")
+
+            batch_results = self.llm_service.collect_3pl_batch(batch_id)
+            for i in positions:
+                generated[i] = batch_results.get(str(i), Exception("No result returned for this question"))
+
+        results = await self.upload_bulk_pyq(pyq_questions, generated_parameters=generated)
+        results["batch_id"] = batch_id
+        return results
+
+    async def _generate_parameters_many(self, pyq_questions: List[PYQQuestion]) -> List[Any]:
+        """
+        Generate 3PL parameters for a batch of questions concurrently.
+
+        Returns:
+            One entry per question: the parameters dict, the exception raised while
+            generating them, or None when the LLM service cannot be used for it
+        """
+        generated: List[Any] = [None] * len(pyq_questions)
+        if not self.llm_service:
+            return generated
+
+        positions, items = await self._build_3pl_items(pyq_questions)
+        for i, parameters in zip(positions, self.llm_service.generate_3pl_parameters_many(items)):
+            generated[i] = parameters
+
+        return generated
+
+    async def _build_3pl_items(self, pyq_questions: List[PYQQuestion]) -> Tuple[List[int], List[Dict[str, Any]]]:
+        """
+        Build generate_3pl_parameters keyword arguments for the questions that can use the LLM.
+
+        Returns:
+            Tuple of (question positions, argument dicts)
+        """
+        # Resolve each distinct exam/subject name once for the whole batch
+        names: Dict[Tuple[str, str], str] = {}
+        for pyq_question in pyq_questions:
+            for table, item_id in (("exams", pyq_question.exam_id), ("subjects", pyq_question.subject_id)):
+                if item_id and (table, item_id) not in names:
+                    names[(table, item_id)] = await self._get_name_by_id(table, item_id)
+
+        positions = []
+        items = []
+        for i, pyq_question in enumerate(pyq_questions):
+            if pyq_question.exam_id and pyq_question.subject_id:
+                positions.append(i)
+                items.append({
+                    "question_text": pyq_question.content,
+                    "options": pyq_question.options,
+                    "correct_answer": pyq_question.correct_answer,
+                    "exam": names[("exams", pyq_question.exam_id)],
+                    "subject": names[("subjects", pyq_question.subject_id)]
+                })
+
+        return positions, items
+
     async def _get_name_by_id(self, table: str, item_id: str) -> str:
         """Helper method to get name by ID from any table."""
         try:
@@ -400,7 +520,9 @@ class PYQUploadService:
 
         if self.supabase:
             try:
-                query = self.supabase.table("pyq_metadata").select("*")
+                query = self.supabase.table("pyq_metadata").select(
+                    "year,exam_session,source,difficulty_level,question_type,marks_allocated"
+                )
                 if filters:
                     if filters.get('year'):
                         query = query.eq("year", filters['year'])
@@ -3,13 +3,25 @@ Supabase Knowledge Base Setup for Computer Adaptive Mastery Testing
 Enhanced with hierarchical retrieval methods
 """
 import os
+import httpx
 from dotenv import load_dotenv
 from supabase import create_client, Client
+from postgrest.utils import SyncClient
 from typing import Dict, List, Any, Optional, Union
 
 # Load environment variables
 load_dotenv()
 
+# The app creates one knowledge base per process and every service shares its
+# client, so all PostgREST calls go through one connection pool. Idle
+# connections are kept for a minute so requests reuse them instead of paying
+# a new TLS handshake (httpx drops them after 5 seconds by default).
+POSTGREST_POOL_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=50,
+    keepalive_expiry=60
+)
+
 class SupabaseKnowledgeBase:
     def __init__(self, supabase_url=None, supabase_key=None):
         """Initialize Supabase client with environment variables."""
@@ -21,6 +33,19 @@ class SupabaseKnowledgeBase:
             raise ValueError("Supabase URL and key must be set in environment variables")
 
         self.client = create_client(self.supabase_url, self.supabase_key)
+        self._pool_postgrest_session()
+
+    def _pool_postgrest_session(self):
+        """Replace the PostgREST HTTP session with one using POSTGREST_POOL_LIMITS."""
+        postgrest = self.client.postgrest
+        session = postgrest.session
+        postgrest.session = SyncClient(
+            base_url=session.base_url,
+            headers=session.headers,
+            timeout=session.timeout,
+            limits=POSTGREST_POOL_LIMITS
+        )
+        session.close()
 
     def create_tables(self):
         """
@@ -302,8 +327,12 @@ class SupabaseKnowledgeBase:
         return result.data
 
     def get_questions_by_filters(self, exam_id=None, subject_id=None, chapter_id=None,
-                               topic_id=None, concept_id=None):
-        """Get questions matching the specified filters."""
+                               topic_id=None, concept_id=None, offset=None, limit=None):
+        """
+        Get questions matching the specified filters.
+        With `limit`, only that many questions starting at `offset` are
+        returned, in a stable order.
+        """
         query = self.client.table("questions").select("*")
 
         if exam_id:
@@ -316,6 +345,9 @@ class SupabaseKnowledgeBase:
             query = query.eq("topic_id", topic_id)
         if concept_id:
             query = query.eq("concept_id", concept_id)
+        if limit is not None:
+            offset = offset or 0
+            query = query.order("id").range(offset, offset + limit - 1)
 
         result = query.execute()
         return result.data
@@ -0,0 +1,458 @@
+-- Migration: Performance Indexes and Helpers
+-- This migration adds indexes and database-side helpers used by the API
+-- to avoid sequential scans and extra round trips
+
+-- =====================================================
+-- STEP 1: Full-text search on question content
+-- =====================================================
+
+-- Expression GIN index used by the text_search filter
+-- (content=wfts(english).<query>, i.e. to_tsvector('english', content) @@ ...);
+-- no stored column, so select("*") question reads do not carry a tsvector
+DROP INDEX IF EXISTS idx_questions_content_tsv;
+ALTER TABLE questions DROP COLUMN IF EXISTS content_tsv;
+
+CREATE INDEX IF NOT EXISTS idx_questions_content_fts
+ON questions USING GIN (to_tsvector('english', content));
+
+-- Trigram indexes so the substring name search (ILIKE '%query%') on
+-- hierarchy levels can use an index instead of a sequential scan
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_exams_name_trgm ON exams USING GIN (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_subjects_name_trgm ON subjects USING GIN (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_chapters_name_trgm ON chapters USING GIN (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_topics_name_trgm ON topics USING GIN (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_concepts_name_trgm ON concepts USING GIN (name gin_trgm_ops);
+
+-- =====================================================
+-- STEP 2: Question image listing
+-- =====================================================
+
+-- Returns every object stored under questions/<qid>/ (question and option
+-- images) so the API can remove them with a single storage remove() call.
+-- Objects are still deleted through the Storage API: deleting rows from
+-- storage.objects directly would leave the underlying files behind.
+CREATE OR REPLACE FUNCTION question_image_paths(qid TEXT)
+RETURNS TABLE(name TEXT)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public, storage
+AS $$
+    SELECT o.name
+    FROM storage.objects o
+    WHERE o.bucket_id = 'question-images'
+      AND o.name LIKE 'questions/' || qid || '/%';
+$$;
+
+-- =====================================================
+-- STEP 3: PYQ filter options
+-- =====================================================
+
+-- Distinct values for each PYQ session filter, computed server-side so the
+-- API does not pull every pyq_metadata row. Empty strings are skipped and
+-- text values sort bytewise, matching the Python fallback.
+CREATE OR REPLACE FUNCTION get_pyq_filter_options()
+RETURNS json
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'years', coalesce((SELECT json_agg(year ORDER BY year)
+            FROM (SELECT DISTINCT year FROM pyq_metadata WHERE year IS NOT NULL) v), '[]'::json),
+        'exam_sessions', coalesce((SELECT json_agg(exam_session ORDER BY exam_session COLLATE "C")
+            FROM (SELECT DISTINCT exam_session FROM pyq_metadata WHERE exam_session <> '') v), '[]'::json),
+        'sources', coalesce((SELECT json_agg(source ORDER BY source COLLATE "C")
+            FROM (SELECT DISTINCT source FROM pyq_metadata WHERE source <> '') v), '[]'::json),
+        'difficulty_levels', coalesce((SELECT json_agg(difficulty_level ORDER BY difficulty_level COLLATE "C")
+            FROM (SELECT DISTINCT difficulty_level FROM pyq_metadata WHERE difficulty_level <> '') v), '[]'::json),
+        'question_types', coalesce((SELECT json_agg(question_type ORDER BY question_type COLLATE "C")
+            FROM (SELECT DISTINCT question_type FROM pyq_metadata WHERE question_type <> '') v), '[]'::json)
+    );
+$$;
+
+-- =====================================================
+-- STEP 4: Denormalized question counts
+-- =====================================================
+
+-- Each hierarchy row carries the number of questions under it, kept current
+-- by a trigger on questions, so counts are a row read instead of a COUNT scan
+ALTER TABLE exams ADD COLUMN IF NOT EXISTS question_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE subjects ADD COLUMN IF NOT EXISTS question_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE chapters ADD COLUMN IF NOT EXISTS question_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE topics ADD COLUMN IF NOT EXISTS question_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE concepts ADD COLUMN IF NOT EXISTS question_count INTEGER NOT NULL DEFAULT 0;
+
+-- Backfill from the existing questions
+UPDATE exams h SET question_count = (SELECT count(*) FROM questions q WHERE q.exam_id = h.id);
+UPDATE subjects h SET question_count = (SELECT count(*) FROM questions q WHERE q.subject_id = h.id);
+UPDATE chapters h SET question_count = (SELECT count(*) FROM questions q WHERE q.chapter_id = h.id);
+UPDATE topics h SET question_count = (SELECT count(*) FROM questions q WHERE q.topic_id = h.id);
+UPDATE concepts h SET question_count = (SELECT count(*) FROM questions q WHERE q.concept_id = h.id);
+
+-- Moves the count from the old to the new parent for every level whose
+-- foreign key changed (inserts only add, deletes only subtract)
+CREATE OR REPLACE FUNCTION questions_maintain_question_counts()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    lvl TEXT;
+    old_id UUID;
+    new_id UUID;
+BEGIN
+    FOREACH lvl IN ARRAY ARRAY['exam', 'subject', 'chapter', 'topic', 'concept'] LOOP
+        old_id := CASE WHEN TG_OP <> 'INSERT' THEN (to_jsonb(OLD) ->> (lvl || '_id'))::UUID END;
+        new_id := CASE WHEN TG_OP <> 'DELETE' THEN (to_jsonb(NEW) ->> (lvl || '_id'))::UUID END;
+
+        IF old_id IS DISTINCT FROM new_id THEN
+            IF old_id IS NOT NULL THEN
+                EXECUTE format('UPDATE %I SET question_count = question_count - 1 WHERE id = $1', lvl || 's')
+                USING old_id;
+            END IF;
+            IF new_id IS NOT NULL THEN
+                EXECUTE format('UPDATE %I SET question_count = question_count + 1 WHERE id = $1', lvl || 's')
+                USING new_id;
+            END IF;
+        END IF;
+    END LOOP;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_questions_question_counts ON questions;
+CREATE TRIGGER trg_questions_question_counts
+AFTER INSERT OR DELETE OR UPDATE OF exam_id, subject_id, chapter_id, topic_id, concept_id
+ON questions
+FOR EACH ROW
+EXECUTE FUNCTION questions_maintain_question_counts();
+
+-- =====================================================
+-- STEP 5: Grouped question counts
+-- =====================================================
+
+-- Question counts for many hierarchy items in one call, for the level named
+-- by the questions column (exam_id, subject_id, chapter_id, topic_id or
+-- concept_id); reads the question_count maintained in STEP 4
+CREATE OR REPLACE FUNCTION count_questions_by(col TEXT, ids UUID[])
+RETURNS TABLE(id UUID, cnt BIGINT)
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    IF col NOT IN ('exam_id', 'subject_id', 'chapter_id', 'topic_id', 'concept_id') THEN
+        RAISE EXCEPTION 'count_questions_by: unsupported column %', col;
+    END IF;
+
+    RETURN QUERY EXECUTE format(
+        'SELECT h.id, h.question_count::BIGINT AS cnt FROM %I h WHERE h.id = ANY($1)',
+        left(col, -3) || 's'
+    ) USING ids;
+END;
+$$;
+
+-- =====================================================
+-- STEP 6: Question attributes
+-- =====================================================
+
+-- Attributes marked true in the q-matrix of each given question, already
+-- joined with their names, so a page of questions is enriched in one call
+CREATE OR REPLACE FUNCTION questions_with_attrs(qids UUID[])
+RETURNS TABLE(question_id UUID, attribute_id UUID, name TEXT, description TEXT)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT qm.question_id, a.id, a.name, a.description
+    FROM q_matrix qm
+    JOIN attributes a ON a.id = qm.attribute_id
+    WHERE qm.value = TRUE
+      AND qm.question_id = ANY(qids);
+$$;
+
+-- =====================================================
+-- STEP 7: Single question q-matrix
+-- =====================================================
+
+-- Every attribute of the question's topic with the question's q-matrix value
+-- (false when there is no entry), joined server-side in one call. Ordered by
+-- attribute ID, as get_attributes_by_topic() orders them, since callers
+-- build positional q-vectors from the result
+CREATE OR REPLACE FUNCTION get_question_qmatrix(qid UUID)
+RETURNS TABLE(id UUID, name TEXT, description TEXT, value BOOLEAN)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT a.id, a.name, a.description, COALESCE(qm.value, FALSE)
+    FROM attributes a
+    LEFT JOIN q_matrix qm ON qm.attribute_id = a.id AND qm.question_id = qid
+    WHERE a.topic_id = (SELECT topic_id FROM questions WHERE questions.id = qid)
+    ORDER BY a.id;
+$$;
+
+-- =====================================================
+-- STEP 8: Denormalized question attribute IDs
+-- =====================================================
+
+-- The attributes marked true in each question's q-matrix, one row per
+-- question, so listings read them without scanning q_matrix. Kept in a side
+-- table rather than on questions so select("*") question reads (and the API
+-- responses built from them) do not carry the array
+DROP TRIGGER IF EXISTS q_matrix_sync ON q_matrix;
+DROP FUNCTION IF EXISTS refresh_question_attribute_ids(UUID);
+ALTER TABLE questions DROP COLUMN IF EXISTS attribute_ids;
+
+CREATE TABLE IF NOT EXISTS question_attribute_ids (
+    question_id UUID PRIMARY KEY REFERENCES questions(id) ON DELETE CASCADE,
+    attribute_ids UUID[] NOT NULL DEFAULT '{}'
+);
+
+-- Set-based refresh, so a statement touching many q-matrix rows rewrites
+-- each affected question once (questions deleted meanwhile are skipped)
+CREATE OR REPLACE FUNCTION refresh_questions_attribute_ids(qids UUID[])
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO question_attribute_ids (question_id, attribute_ids)
+    SELECT q.id, COALESCE(
+        (SELECT array_agg(qm.attribute_id ORDER BY qm.attribute_id)
+         FROM q_matrix qm
+         WHERE qm.question_id = q.id AND qm.value = TRUE),
+        '{}'
+    )
+    FROM questions q
+    WHERE q.id = ANY(qids)
+    ON CONFLICT (question_id) DO UPDATE SET attribute_ids = EXCLUDED.attribute_ids;
+$$;
+
+-- Backfill from the existing q-matrix
+SELECT refresh_questions_attribute_ids(ARRAY(SELECT DISTINCT question_id FROM q_matrix));
+
+-- Statement-level: the transition tables hold every row the statement changed
+CREATE OR REPLACE FUNCTION sync_question_attribute_ids()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_questions_attribute_ids(ARRAY(SELECT DISTINCT question_id FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM refresh_questions_attribute_ids(ARRAY(SELECT DISTINCT question_id FROM old_rows));
+    ELSE
+        PERFORM refresh_questions_attribute_ids(ARRAY(
+            SELECT question_id FROM old_rows
+            UNION
+            SELECT question_id FROM new_rows
+        ));
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+-- Triggers with transition tables cover a single event each
+DROP TRIGGER IF EXISTS q_matrix_sync ON q_matrix;
+DROP TRIGGER IF EXISTS q_matrix_sync_insert ON q_matrix;
+DROP TRIGGER IF EXISTS q_matrix_sync_update ON q_matrix;
+DROP TRIGGER IF EXISTS q_matrix_sync_delete ON q_matrix;
+
+CREATE TRIGGER q_matrix_sync_insert
+AFTER INSERT ON q_matrix
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION sync_question_attribute_ids();
+
+CREATE TRIGGER q_matrix_sync_update
+AFTER UPDATE ON q_matrix
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION sync_question_attribute_ids();
+
+CREATE TRIGGER q_matrix_sync_delete
+AFTER DELETE ON q_matrix
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION sync_question_attribute_ids();
+
+-- =====================================================
+-- STEP 9: Covering q-matrix index
+-- =====================================================
+
+-- Per-question q-matrix lookups (and the joins above) become index-only scans
+CREATE INDEX IF NOT EXISTS q_matrix_qid_covering
+ON q_matrix (question_id) INCLUDE (attribute_id, value);
+
+-- =====================================================
+-- STEP 10: Hierarchy tree
+-- =====================================================
+
+-- The nested exam tree served by /api/hierarchy/tree, built in one call
+-- (all exams, or only exam_ids when given). School exams nest
+-- Exam -> Class -> Subject; competitive exams nest Exam -> Subject; both
+-- continue Subject -> Chapter -> Topic -> Concept
+CREATE OR REPLACE FUNCTION subject_tree_node(s subjects)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT jsonb_build_object(
+        'id', s.id,
+        'name', s.name,
+        'description', s.description,
+        'type', 'subject',
+        'children', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'id', c.id,
+                'name', c.name,
+                'description', c.description,
+                'type', 'chapter',
+                'children', COALESCE((
+                    SELECT jsonb_agg(jsonb_build_object(
+                        'id', t.id,
+                        'name', t.name,
+                        'description', t.description,
+                        'type', 'topic',
+                        'children', COALESCE((
+                            SELECT jsonb_agg(jsonb_build_object(
+                                'id', co.id,
+                                'name', co.name,
+                                'description', co.description,
+                                'type', 'concept'
+                            ))
+                            FROM concepts co
+                            WHERE co.topic_id = t.id
+                        ), '[]'::JSONB)
+                    ))
+                    FROM topics t
+                    WHERE t.chapter_id = c.id
+                ), '[]'::JSONB)
+            ))
+            FROM chapters c
+            WHERE c.subject_id = s.id
+        ), '[]'::JSONB)
+    );
+$$;
+
+CREATE OR REPLACE FUNCTION get_hierarchy_tree(exam_ids UUID[] DEFAULT NULL)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT COALESCE(jsonb_agg(jsonb_build_object(
+        'id', e.id,
+        'name', e.name,
+        'description', e.description,
+        'exam_type', COALESCE(e.exam_type, 'competitive'),
+        'type', 'exam',
+        'children', CASE WHEN e.exam_type = 'school' THEN COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'id', cl.id,
+                'name', cl.name,
+                'description', cl.description,
+                'class_number', cl.class_number,
+                'type', 'class',
+                'children', COALESCE((
+                    SELECT jsonb_agg(subject_tree_node(s))
+                    FROM subjects s
+                    WHERE s.class_id = cl.id
+                ), '[]'::JSONB)
+            ))
+            FROM classes cl
+            WHERE cl.exam_id = e.id
+        ), '[]'::JSONB) ELSE COALESCE((
+            SELECT jsonb_agg(subject_tree_node(s))
+            FROM subjects s
+            WHERE s.exam_id = e.id
+        ), '[]'::JSONB) END
+    )), '[]'::JSONB)
+    FROM exams e
+    WHERE exam_ids IS NULL OR e.id = ANY(exam_ids);
+$$;
+
+-- =====================================================
+-- STEP 11: Ensure hierarchy elements
+-- =====================================================
+
+-- Element names are unique per parent, ignoring case. Existing case-variant
+-- duplicates would make the index creation fail, so stop here first with a
+-- list of them. Merge or rename each group (moving its children and
+-- questions to the row that is kept) and re-run. To list one level's groups:
+--   SELECT exam_id, lower(name), array_agg(id) FROM subjects
+--   GROUP BY exam_id, lower(name) HAVING count(*) > 1;
+-- (chapters: subject_id, topics: chapter_id, concepts: topic_id)
+DO $$
+DECLARE
+    duplicates TEXT;
+BEGIN
+    SELECT string_agg(format('%s %s under %s: %s', level, name, parent_id, ids), E'\n')
+    INTO duplicates
+    FROM (
+        SELECT 'subject' AS level, lower(name) AS name, exam_id AS parent_id, array_agg(id) AS ids
+        FROM subjects WHERE exam_id IS NOT NULL GROUP BY exam_id, lower(name) HAVING count(*) > 1
+        UNION ALL
+        SELECT 'chapter', lower(name), subject_id, array_agg(id)
+        FROM chapters WHERE subject_id IS NOT NULL GROUP BY subject_id, lower(name) HAVING count(*) > 1
+        UNION ALL
+        SELECT 'topic', lower(name), chapter_id, array_agg(id)
+        FROM topics WHERE chapter_id IS NOT NULL GROUP BY chapter_id, lower(name) HAVING count(*) > 1
+        UNION ALL
+        SELECT 'concept', lower(name), topic_id, array_agg(id)
+        FROM concepts WHERE topic_id IS NOT NULL GROUP BY topic_id, lower(name) HAVING count(*) > 1
+    ) d;
+
+    IF duplicates IS NOT NULL THEN
+        RAISE EXCEPTION E'Resolve duplicate hierarchy names before STEP 11:\n%', duplicates;
+    END IF;
+END;
+$$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS subjects_exam_name_key ON subjects (exam_id, lower(name));
+CREATE UNIQUE INDEX IF NOT EXISTS chapters_subject_name_key ON chapters (subject_id, lower(name));
+CREATE UNIQUE INDEX IF NOT EXISTS topics_chapter_name_key ON topics (chapter_id, lower(name));
+CREATE UNIQUE INDEX IF NOT EXISTS concepts_topic_name_key ON concepts (topic_id, lower(name));
+
+-- Get or create the named element under its parent in one atomic statement;
+-- inserted is false when an element with that name already existed
+CREATE OR REPLACE FUNCTION ensure_hierarchy_element(level TEXT, parent_id UUID, element_name TEXT, element_description TEXT DEFAULT '')
+RETURNS TABLE(element JSONB, inserted BOOLEAN)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF level = 'subject' THEN
+        RETURN QUERY
+        INSERT INTO subjects AS h (exam_id, name, description)
+        VALUES (parent_id, element_name, element_description)
+        ON CONFLICT (exam_id, lower(name)) DO UPDATE SET name = h.name
+        RETURNING to_jsonb(h.*), h.xmax = 0;
+    ELSIF level = 'chapter' THEN
+        RETURN QUERY
+        INSERT INTO chapters AS h (subject_id, name, description)
+        VALUES (parent_id, element_name, element_description)
+        ON CONFLICT (subject_id, lower(name)) DO UPDATE SET name = h.name
+        RETURNING to_jsonb(h.*), h.xmax = 0;
+    ELSIF level = 'topic' THEN
+        RETURN QUERY
+        INSERT INTO topics AS h (chapter_id, name, description)
+        VALUES (parent_id, element_name, element_description)
+        ON CONFLICT (chapter_id, lower(name)) DO UPDATE SET name = h.name
+        RETURNING to_jsonb(h.*), h.xmax = 0;
+    ELSIF level = 'concept' THEN
+        RETURN QUERY
+        INSERT INTO concepts AS h (topic_id, name, description)
+        VALUES (parent_id, element_name, element_description)
+        ON CONFLICT (topic_id, lower(name)) DO UPDATE SET name = h.name
+        RETURNING to_jsonb(h.*), h.xmax = 0;
+    ELSE
+        RAISE EXCEPTION 'Invalid level: %', level;
+    END IF;
+END;
+$$;
+
+-- =====================================================
+-- VERIFICATION QUERIES
+-- =====================================================
+
+-- Check that the text search uses the GIN index
+-- EXPLAIN SELECT id FROM questions
+-- WHERE to_tsvector('english', content) @@ websearch_to_tsquery('english', 'newton law');